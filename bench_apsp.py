@@ -0,0 +1,51 @@
+#!/usr/bin/python
+
+
+import random
+import sys
+import test_apsp
+import time
+
+
+USAGE = 'Usage: bench_apsp.py [nodes [edges]]\n'
+
+
+def AddRandomEdges(fw, nodes, edges, seed=4):
+    rng = random.Random(seed)
+    for _ in xrange(edges):
+        fw.Add(rng.randint(1, nodes), rng.randint(1, nodes),
+               rng.randint(0, 100))
+    return fw
+
+
+def main():
+    """Time NumpyFloydWarshall against BlockedFloydWarshall settings."""
+    args = sys.argv[1:]
+    if len(args) > 2:
+        sys.stderr.write(USAGE)
+        sys.exit(2)
+    nodes = int(args[0]) if args else 800
+    edges = int(args[1]) if len(args) > 1 else 10 * nodes
+    engines = [('naive', test_apsp.NumpyFloydWarshall())]
+    for tile_size in (64, 128, 256, 512):
+        for threads in (None, 2, 4):
+            engines.append((
+                'tile {} threads {}'.format(tile_size, threads),
+                test_apsp.BlockedFloydWarshall(tile_size=tile_size,
+                                               threads=threads)))
+    dist = None
+    for name, fw in engines:
+        AddRandomEdges(fw, nodes, edges)
+        t1 = time.time()
+        fw.ShortestPaths()
+        sys.stdout.write('{}: {:.3f}s\n'.format(name, time.time() - t1))
+        sys.stdout.flush()
+        if dist is None:
+            dist = fw.dist
+        elif not (dist == fw.dist).all():
+            sys.stderr.write('{}: distances differ\n'.format(name))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
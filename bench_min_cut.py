@@ -0,0 +1,41 @@
+#!/usr/bin/python
+
+
+import sys
+import test_min_cut
+import time
+
+
+USAGE = 'Usage: bench_min_cut.py [trials [file]]\n'
+
+
+def main():
+    """Time StoerWagner against RandomMinCut trials on one graph file."""
+    args = sys.argv[1:]
+    if len(args) > 2:
+        sys.stderr.write(USAGE)
+        sys.exit(2)
+    trials = int(args[0]) if args else 5
+    file_name = args[1] if len(args) > 1 else 'kargerMinCut.txt'
+    graphs = [test_min_cut.StoerWagner(), test_min_cut.MinCutGraph()]
+    with open(file_name, 'r') as fd:
+        for line in fd:
+            node_list = line.split()
+            for graph in graphs:
+                graph.AddEdge(node_list[0], node_list[1:])
+    start = time.time()
+    weight, _ = graphs[0].MinCut()
+    sys.stdout.write('stoer-wagner: {:.3f}s cut {}\n'.format(
+        time.time() - start, weight))
+    sys.stdout.flush()
+    start = time.time()
+    min_cut = graphs[1].RandomMinCut(trials=trials)
+    sys.stdout.write('random min cut: {:.3f}s cut {} for {} trials\n'.format(
+        time.time() - start, len(min_cut), trials))
+    if weight > len(min_cut):
+        sys.stderr.write('stoer-wagner cut is larger than a random cut\n')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
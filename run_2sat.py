@@ -0,0 +1,37 @@
+#!/usr/bin/python
+
+
+import sys
+import test_2sat
+
+
+USAGE = 'Usage: run_2sat.py [-p processes] file...\n'
+
+
+def main():
+    """Solve 2-SAT instance files in parallel and print results as they end."""
+    args = sys.argv[1:]
+    processes = None
+    if len(args) >= 2 and args[0] == '-p':
+        processes = int(args[1])
+        args = args[2:]
+    if not args:
+        sys.stderr.write(USAGE)
+        sys.exit(2)
+    failed = False
+    for file_name, satisfiable, parse_time, solve_time, error in (
+        test_2sat.SolveInstances(args, processes=processes)):
+        if error is not None:
+            failed = True
+            sys.stderr.write('{}: ERROR {}\n'.format(file_name, error))
+            continue
+        sys.stdout.write('{}: {} parse: {:.3f}s solve: {:.3f}s\n'.format(
+            file_name, 'SAT' if satisfiable else 'UNSAT', parse_time,
+            solve_time))
+        sys.stdout.flush()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
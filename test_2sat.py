@@ -1,7 +1,13 @@
 #!/opt/local/bin/pypy
 
 
+import array
+import multiprocessing
+import os
+import tempfile
+import test_dijkstra
 import test_scc
+import time
 import unittest2
 
 
@@ -62,6 +68,112 @@ class TwoSat(object):
         return new_clauses
 
 
+class LinearTwoSat(TwoSat):
+    """Linear-time 2-SAT with one Tarjan pass over dense literal ids.
+
+    Variable i (in order of first use) has literal 2*i and its negation
+    2*i+1, so ~literal is literal ^ 1.
+    """
+
+    def __init__(self):
+        super(LinearTwoSat, self).__init__()
+        self.var_ids = {}
+        self.var_list = []
+        self.literals = array.array('l')
+
+    def AddClause(self, var1, var2):
+        self.literals.append(self.GetLiteral(var1))
+        self.literals.append(self.GetLiteral(var2))
+
+    def GetImplicationGraph(self):
+        # Clause (a or b) gives the edges ~a -> b and ~b -> a.
+        literals = self.literals
+        sources, dests = array.array('l'), array.array('l')
+        for i in xrange(0, len(literals), 2):
+            literal1, literal2 = literals[i], literals[i+1]
+            sources.append(literal1 ^ 1)
+            dests.append(literal2)
+            sources.append(literal2 ^ 1)
+            dests.append(literal1)
+        return test_dijkstra.CsrGraph.FromArrays(
+            sources, dests, array.array('b', [0]) * len(sources),
+            num_nodes=2 * len(self.var_list), typecode='b')
+
+    def GetLiteral(self, var):
+        if not var:
+            raise Error('Invalid var: {}'.format(var))
+        if abs(var) not in self.var_ids:
+            self.var_ids[abs(var)] = len(self.var_list)
+            self.var_list.append(abs(var))
+        return 2 * self.var_ids[abs(var)] + (var < 0)
+
+    def IsSatisfiable(self):
+        return self.Solve() is not None
+
+    def Solve(self):
+        """Return a satisfying {var: bool} assignment, or None if none.
+
+        Tarjan numbers SCCs in reverse topological order, so setting x true
+        iff comp[x] < comp[~x] never lets a true literal imply a false one.
+        """
+        _, comp = test_scc.TarjanScc(self.GetImplicationGraph()).GetComponents()
+        assignment = {}
+        for var_id, var in enumerate(self.var_list):
+            comp_true, comp_false = comp[2*var_id], comp[2*var_id+1]
+            if comp_true == comp_false:
+                return None
+            assignment[var] = comp_true < comp_false
+        return assignment
+
+
+def ReadInstance(file_name, two_sat_class=LinearTwoSat):
+    """Read a 2sat*.txt file: the clause count, then one clause per line."""
+    two_sat = two_sat_class()
+    with open(file_name, 'r') as fd:
+        line = fd.readline()
+        try:
+            for _ in xrange(int(line)):
+                line = fd.readline()
+                var1, var2 = (int(l) for l in line.split())
+                two_sat.AddClause(var1, var2)
+        except ValueError:
+            raise Error('Invalid line in {}: {!r}'.format(file_name, line))
+    return two_sat
+
+
+def SolveInstance(file_name):
+    """Return (file_name, satisfiable, parse seconds, solve seconds, error).
+
+    A file that cannot be read or parsed gives satisfiable None and the
+    error message, so one bad file does not abort a batch.
+    """
+    start = time.time()
+    try:
+        two_sat = ReadInstance(file_name)
+    except (IOError, Error) as e:
+        return file_name, None, time.time() - start, 0.0, str(e)
+    parsed = time.time()
+    satisfiable = two_sat.IsSatisfiable()
+    return file_name, satisfiable, parsed - start, time.time() - parsed, None
+
+
+def SolveInstances(file_names, processes=None):
+    """Solve 2-SAT files in a process pool.
+
+    Yields the SolveInstance tuples in completion order, not input order.
+    """
+    pool = multiprocessing.Pool(processes)
+    try:
+        for res in pool.imap_unordered(SolveInstance, file_names):
+            yield res
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
 class TwoSatTest(unittest2.TestCase):
         
     def testSingleVarTrue(self):
@@ -109,15 +221,129 @@ class TwoSatTest(unittest2.TestCase):
         self.assertTrue(two_sat.IsSatisfiable())
 
 
+class LinearTwoSatTest(unittest2.TestCase):
+
+    def testSingleVarTrue(self):
+        two_sat = LinearTwoSat()
+        two_sat.AddClause(1, 1)
+        self.assertTrue(two_sat.IsSatisfiable())
+
+    def test2SatFalse1(self):
+        two_sat = LinearTwoSat()
+        clauses = [(-1, 2), (-2, -1), (1, -2), (2, 1)]
+        for clause in clauses:
+            two_sat.AddClause(*clause)
+        self.assertFalse(two_sat.IsSatisfiable())
+
+    def test2SatFalse2(self):
+        two_sat = LinearTwoSat()
+        clauses = [(2, 4), (1, 2), (-1, 2), (-2, 1), (-1, -2)]
+        for clause in clauses:
+            two_sat.AddClause(*clause)
+        self.assertFalse(two_sat.IsSatisfiable())
+
+    def test2SatTrue1(self):
+        two_sat = LinearTwoSat()
+        clauses = [(1, 2), (-2, 3), (-1, -2), (3, 4),
+                   (-3, 5), (-4, -5), (-3, 4)]
+        for clause in clauses:
+            two_sat.AddClause(*clause)
+        self.assertTrue(two_sat.IsSatisfiable())
+
+    def test2SatTrue2(self):
+        two_sat = LinearTwoSat()
+        clauses = [(4, 5), (1, 2), (2, 3), (3, 4),
+                   (-1, -3), (-2, -4)]
+        for clause in clauses:
+            two_sat.AddClause(*clause)
+        self.assertTrue(two_sat.IsSatisfiable())
+
+    def test2SatTrue3(self):
+        two_sat = LinearTwoSat()
+        clauses = [(8, 12), (1, 4), (-2, 5), (3, 7), (2, -5),
+                   (-8, -2), (3, -1), (4, -3), (-3, -7), (6, 7),
+                   (1, 7), (-7, -1)]
+        for clause in clauses:
+            two_sat.AddClause(*clause)
+        self.assertTrue(two_sat.IsSatisfiable())
+
+    def CheckAssignment(self, clauses):
+        two_sat = LinearTwoSat()
+        for clause in clauses:
+            two_sat.AddClause(*clause)
+        assignment = two_sat.Solve()
+        self.assertIsNotNone(assignment)
+        for var1, var2 in clauses:
+            self.assertTrue(assignment[abs(var1)] == (var1 > 0) or
+                            assignment[abs(var2)] == (var2 > 0))
+
+    def testInvalidVar(self):
+        self.assertRaises(Error, LinearTwoSat().AddClause, 0, 1)
+
+    def testSingleVarFalse(self):
+        two_sat = LinearTwoSat()
+        two_sat.AddClause(-3, -3)
+        self.assertEqual({3: False}, two_sat.Solve())
+
+    def testAssignment(self):
+        self.CheckAssignment([(1, 2), (-2, 3), (-1, -2), (3, 4),
+                              (-3, 5), (-4, -5), (-3, 4)])
+        self.CheckAssignment([(8, 12), (1, 4), (-2, 5), (3, 7), (2, -5),
+                              (-8, -2), (3, -1), (4, -3), (-3, -7), (6, 7),
+                              (1, 7), (-7, -1)])
+
+
+class SolveInstancesTest(unittest2.TestCase):
+    INSTANCES = [[(1, 2), (-2, 3), (-1, -2), (3, 4), (-3, 5), (-4, -5),
+                  (-3, 4)],
+                 [(-1, 2), (-2, -1), (1, -2), (2, 1)],
+                 [(1, 1)]]
+
+    def setUp(self):
+        self.file_names = []
+        for clauses in self.INSTANCES:
+            fd, file_name = tempfile.mkstemp()
+            with os.fdopen(fd, 'w') as instance_file:
+                instance_file.write('{}\n'.format(len(clauses)))
+                for clause in clauses:
+                    instance_file.write('{} {}\n'.format(*clause))
+            self.file_names.append(file_name)
+
+    def tearDown(self):
+        for file_name in self.file_names:
+            os.remove(file_name)
+
+    def testSolveInstance(self):
+        file_name, satisfiable, parse_time, solve_time, error = (
+            SolveInstance(self.file_names[0]))
+        self.assertEqual(self.file_names[0], file_name)
+        self.assertTrue(satisfiable)
+        self.assertGreaterEqual(parse_time, 0)
+        self.assertGreaterEqual(solve_time, 0)
+        self.assertIsNone(error)
+
+    def testInvalidInstance(self):
+        with open(self.file_names[0], 'w') as instance_file:
+            instance_file.write('2\n1 2\n3\n')
+        _, satisfiable, _, _, error = SolveInstance(self.file_names[0])
+        self.assertIsNone(satisfiable)
+        self.assertIn('Invalid line', error)
+
+    def testSolveInstances(self):
+        missing = self.file_names[0] + '.missing'
+        res = dict((file_name, (satisfiable, error is None))
+                   for file_name, satisfiable, _, _, error
+                   in SolveInstances(self.file_names + [missing], processes=2))
+        self.assertEqual(dict(zip(self.file_names + [missing],
+                                  [(True, True), (False, True), (True, True),
+                                   (None, False)])), res)
+
+
 class TwoSatHWTest(unittest2.TestCase):
+    two_sat_class = TwoSat
 
     def GetInstance(self, file_name):
-        two_sat = TwoSat()
-        with open(file_name, 'r') as fd:
-            for _ in xrange(int(fd.readline())):
-                line = fd.readline()
-                two_sat.AddClause(*(int(l) for l in line.split()))
-        return two_sat
+        return ReadInstance(file_name, two_sat_class=self.two_sat_class)
                 
     def testHW1(self):
         two_sat = self.GetInstance('2sat1.txt')
@@ -144,6 +370,32 @@ class TwoSatHWTest(unittest2.TestCase):
         self.assertFalse(two_sat.IsSatisfiable())
 
 
+class LinearTwoSatHWTest(TwoSatHWTest):
+    two_sat_class = LinearTwoSat
+
+    def testBatch(self):
+        file_names = ['2sat{}.txt'.format(i) for i in xrange(1, 7)]
+        res = {}
+        for file_name, satisfiable, _, _, _ in SolveInstances(file_names):
+            res[file_name] = satisfiable
+        self.assertEqual(
+            dict(zip(file_names, [True, False, True, True, False, False])),
+            res)
+
+    def testHW1Assignment(self):
+        clauses = []
+        with open('2sat1.txt', 'r') as fd:
+            for _ in xrange(int(fd.readline())):
+                clauses.append([int(l) for l in fd.readline().split()])
+        two_sat = LinearTwoSat()
+        for clause in clauses:
+            two_sat.AddClause(*clause)
+        assignment = two_sat.Solve()
+        for var1, var2 in clauses:
+            self.assertTrue(assignment[abs(var1)] == (var1 > 0) or
+                            assignment[abs(var2)] == (var2 > 0))
+
+
 if __name__ == '__main__':
     unittest2.main()
 
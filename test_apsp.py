@@ -1,10 +1,24 @@
 #!/opt/local/bin/pypy
 
 
+import array
 import collections
+import multiprocessing
+import multiprocessing.pool
+import random
 import test_dijkstra
 import unittest2
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Per-process state of the Johnson Dijkstra workers.  It is set once by
+# InitDijkstraWorker so that tasks only carry their source node ids.
+WORKER_STATE = {}
+
 
 class Error(Exception):
     """Base error class."""
@@ -29,13 +43,13 @@ class BellmanFord(object):
             self.graph[node2] = {}
         self.in_nodes[node2].append(node1)
 
-    def GetNegativeCycle(self):
-        start_node = None
-        for node in self.current_a:
-            if self.prev_a[node] != self.current_a[node]:
-                repeat = set([node])
-                start_node = node
-                break
+    def GetNegativeCycle(self, start_node=None):
+        if start_node is None:
+            for node in self.current_a:
+                if self.prev_a[node] != self.current_a[node]:
+                    start_node = node
+                    break
+        repeat = set([start_node])
         # The start_node may not be part of the cycle.  Find the first node in
         # the cycle.
         node = start_node
@@ -56,6 +70,19 @@ class BellmanFord(object):
         cost += self.graph[self.current_pred[node]][node]
         return '<-'.join(str(node) for node in cycle_list), cost
 
+    def GetPath(self, node):
+        """Return the shortest path from the last source to node."""
+        if node not in self.current_a:
+            return []
+        path = [node]
+        while self.current_pred[node] is not None:
+            node = self.current_pred[node]
+            path.append(node)
+            if len(path) > len(self.graph):
+                raise Error('Pred chain does not reach the source.')
+        path.reverse()
+        return path
+
     def ShortestPaths(self, source):
         self.current_a[source] = 0
         self.current_pred[source] = None
@@ -83,11 +110,60 @@ class BellmanFord(object):
                 self.current_a[node], self.current_pred[node] = min(cost_list)
 
 
-class FloydWarshall(object):
+class QueueBellmanFord(BellmanFord):
+    """Bellman-Ford that only relaxes out-edges of nodes changed last round.
+
+    Without a negative cycle a node changes in at most V-1 rounds, so a node
+    changing for the V-th time is fed to GetNegativeCycle.
+    """
 
     def __init__(self):
+        super(QueueBellmanFord, self).__init__()
+        self.stats = {}
+
+    def ShortestPaths(self, source):
+        self.current_a, self.current_pred = {source: 0}, {source: None}
+        self.stats = {'rounds': 0, 'relaxations': 0}
+        current_a, current_pred = self.current_a, self.current_pred
+        change_counts = collections.defaultdict(int)
+        max_changes = len(self.graph)
+        changed = [source]
+        while changed:
+            self.stats['rounds'] += 1
+            next_changed, in_next = [], set()
+            for node in changed:
+                node_dist = current_a[node]
+                for neighbor, cost in self.graph[node].iteritems():
+                    neighbor_dist = node_dist + cost
+                    if (neighbor in current_a and
+                        neighbor_dist >= current_a[neighbor]):
+                        continue
+                    current_a[neighbor] = neighbor_dist
+                    current_pred[neighbor] = node
+                    self.stats['relaxations'] += 1
+                    if neighbor in in_next:
+                        continue
+                    in_next.add(neighbor)
+                    next_changed.append(neighbor)
+                    change_counts[neighbor] += 1
+                    if change_counts[neighbor] >= max_changes:
+                        raise NegativeCycleError(
+                            'cycle: {}; cost: {}'.format(
+                                *self.GetNegativeCycle(neighbor)))
+            changed = next_changed
+        return current_a
+
+
+class FloydWarshall(object):
+
+    def __init__(self, paths=False):
         self.nodes = set()
         self.current_a = collections.defaultdict(dict)
+        # With paths, ShortestPaths also keeps a flat n x n matrix of next-hop
+        # node ids (4 bytes per pair) for GetPath.
+        self.paths = paths
+        self.node_list, self.node_ids = [], {}
+        self.next_hop = None
 
     def Add(self, node1, node2, cost):
         self.nodes.add(node1)
@@ -101,7 +177,42 @@ class FloydWarshall(object):
         return min(min(node_info.values())
                    for node_info in self.current_a.values())
 
+    def GetPath(self, node1, node2):
+        """Return the nodes of a shortest path, or [] if unreachable."""
+        if self.next_hop is None:
+            raise Error('No next-hop matrix; run ShortestPaths with paths.')
+        i, j = self.node_ids[node1], self.node_ids[node2]
+        if self.NextHop(i, j) < 0:
+            return []
+        path = [node1]
+        while i != j:
+            i = self.NextHop(i, j)
+            path.append(self.node_list[i])
+            if len(path) > len(self.node_list):
+                raise NegativeCycleError(
+                    'path {}->{} runs into a negative cycle'.format(
+                        node1, node2))
+        return path
+
+    def InitNextHop(self):
+        self.node_list = sorted(self.nodes)
+        self.node_ids = dict(
+            (node, i) for i, node in enumerate(self.node_list))
+        size = len(self.node_list)
+        self.next_hop = array.array('i', [-1]) * (size * size)
+        for node1, node_info in self.current_a.iteritems():
+            for node2 in node_info:
+                self.next_hop[self.node_ids[node1]*size +
+                              self.node_ids[node2]] = self.node_ids[node2]
+
+    def NextHop(self, i, j):
+        return self.next_hop[i*len(self.node_list) + j]
+
     def ShortestPaths(self):
+        if self.paths:
+            self.InitNextHop()
+        next_hop, node_ids = self.next_hop, self.node_ids
+        size = len(self.node_list)
         for k in self.nodes:
             prev_a = self.current_a
             self.current_a = collections.defaultdict(dict) 
@@ -111,12 +222,178 @@ class FloydWarshall(object):
                         costs = [prev_a[node1][node2]]
                     except KeyError:
                         costs = []
+                    direct = len(costs)
                     try:
                         costs.append(prev_a[node1][k]+prev_a[k][node2])
                     except KeyError:
                         pass
                     if costs:
                         self.current_a[node1][node2] = min(costs)
+                    if (next_hop is not None and len(costs) > direct and
+                        (not direct or costs[1] < costs[0])):
+                        # The path now goes through k.
+                        row = node_ids[node1] * size
+                        next_hop[row+node_ids[node2]] = next_hop[
+                            row+node_ids[k]]
+
+
+class NumpyFloydWarshall(FloydWarshall):
+    """Floyd-Warshall on a dense NumPy distance matrix updated in place.
+
+    Each k step is one broadcast minimum of the matrix against
+    column k + row k, so memory stays at a single n x n matrix.
+    """
+
+    def __init__(self, dtype=None, paths=False):
+        if numpy is None:
+            raise Error('NumPy is required for NumpyFloydWarshall.')
+        super(NumpyFloydWarshall, self).__init__(paths=paths)
+        self.dtype = numpy.dtype(numpy.float64 if dtype is None else dtype)
+        if self.dtype.kind == 'f':
+            self.infinite = numpy.inf
+        else:
+            # Leave headroom so that infinite + infinite cannot overflow.
+            self.infinite = numpy.iinfo(self.dtype).max // 2
+        self.edges = {}
+        self.node_ids = {}
+        self.dist = None
+        self.integral = True
+
+    def Add(self, node1, node2, cost):
+        self.nodes.add(node1)
+        self.nodes.add(node2)
+        self.edges[(node1, node2)] = cost
+        if not isinstance(cost, (int, long)):
+            self.integral = False
+
+    def GetDistance(self, node1, node2):
+        """Return the shortest distance or None if node2 is unreachable."""
+        dist = self.dist[self.node_ids[node1], self.node_ids[node2]]
+        if dist >= self.infinite:
+            return None
+        return self.ToNumber(dist)
+
+    def GetSSP(self):
+        self.ShortestPaths()
+        return self.ToNumber(self.dist.min())
+
+    def InitDistances(self):
+        self.node_list = sorted(self.nodes)
+        self.node_ids = dict(
+            (node, i) for i, node in enumerate(self.node_list))
+        size = len(self.node_list)
+        self.dist = numpy.full((size, size), self.infinite, dtype=self.dtype)
+        numpy.fill_diagonal(self.dist, 0)
+        if self.paths:
+            self.next_hop = numpy.full((size, size), -1, dtype=numpy.int32)
+            self.next_hop[numpy.diag_indices(size)] = numpy.arange(size)
+        for (node1, node2), cost in self.edges.iteritems():
+            i, j = self.node_ids[node1], self.node_ids[node2]
+            # A non-negative self-loop never beats the empty path.
+            self.dist[i, j] = min(self.dist[i, j], cost)
+            if self.paths:
+                self.next_hop[i, j] = j
+
+    def NextHop(self, i, j):
+        return self.next_hop[i, j]
+
+    def ShortestPaths(self):
+        self.InitDistances()
+        whole = (0, len(self.dist))
+        self.UpdateTile(whole, whole, whole)
+        self.CheckDistances()
+
+    def UpdateTile(self, rows, columns, ks):
+        """Relax dist[rows, columns] through every k in the ks range."""
+        dist = self.dist
+        row_start, row_end = rows
+        column_start, column_end = columns
+        tile = dist[row_start:row_end, column_start:column_end]
+        if not self.paths:
+            for k in xrange(*ks):
+                numpy.minimum(tile, dist[row_start:row_end, k, None] +
+                              dist[None, k, column_start:column_end], out=tile)
+            return
+        next_hop = self.next_hop
+        next_tile = next_hop[row_start:row_end, column_start:column_end]
+        for k in xrange(*ks):
+            costs = (dist[row_start:row_end, k, None] +
+                     dist[None, k, column_start:column_end])
+            better = costs < tile
+            numpy.copyto(tile, costs, where=better)
+            numpy.copyto(next_tile, next_hop[row_start:row_end, k, None],
+                         where=better)
+
+    def CheckDistances(self):
+        dist = self.dist
+        if self.dtype.kind != 'f':
+            # Negative edges pull unreachable entries slightly below the
+            # sentinel.  Snap them back.
+            unreachable = dist > self.infinite // 2
+            dist[unreachable] = self.infinite
+            if self.paths:
+                self.next_hop[unreachable] = -1
+        negative = numpy.flatnonzero(numpy.diagonal(dist) < 0)
+        if len(negative):
+            raise NegativeCycleError('node {} is on a negative cycle'.format(
+                self.node_list[negative[0]]))
+
+    def ToNumber(self, value):
+        value = value.item()
+        if self.integral and isinstance(value, float):
+            return int(value)
+        return value
+
+
+class BlockedFloydWarshall(NumpyFloydWarshall):
+    """Cache-tiled Floyd-Warshall.
+
+    For each diagonal tile kb, first close the diagonal tile itself, then
+    the tiles in row kb and column kb, then every remaining tile from its
+    row-kb and column-kb tiles.  The last phase has no dependencies between
+    tiles, so it can run in a thread pool while NumPy releases the GIL.
+
+    The defaults come from bench_apsp.py on one core: below about 1000
+    nodes a single tile (NumpyFloydWarshall) is fastest, and at 1600 nodes
+    256-wide tiles beat it by about 15%.  Threads only pay off with more
+    cores, so the pool is off by default.
+    """
+
+    def __init__(self, tile_size=256, threads=None, dtype=None, paths=False):
+        super(BlockedFloydWarshall, self).__init__(dtype=dtype, paths=paths)
+        if tile_size < 1:
+            raise Error('Invalid tile_size: {}'.format(tile_size))
+        self.tile_size = tile_size
+        self.threads = threads
+
+    def ShortestPaths(self):
+        self.InitDistances()
+        size = len(self.dist)
+        blocks = [(start, min(start+self.tile_size, size))
+                  for start in xrange(0, size, self.tile_size)]
+        pool = None
+        if self.threads and self.threads > 1:
+            pool = multiprocessing.pool.ThreadPool(self.threads)
+        try:
+            for k_block in blocks:
+                self.UpdateTile(k_block, k_block, k_block)
+                for block in blocks:
+                    if block != k_block:
+                        self.UpdateTile(k_block, block, k_block)
+                        self.UpdateTile(block, k_block, k_block)
+                tiles = [(row_block, column_block, k_block)
+                         for row_block in blocks if row_block != k_block
+                         for column_block in blocks if column_block != k_block]
+                if pool is None:
+                    for tile in tiles:
+                        self.UpdateTile(*tile)
+                else:
+                    pool.map(lambda tile: self.UpdateTile(*tile), tiles)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.CheckDistances()
 
 
 class ModifyFloydWarshall(FloydWarshall):
@@ -141,44 +418,164 @@ class ModifyFloydWarshall(FloydWarshall):
                         pass
 
 
+def InitDijkstraWorker(graph, potentials, paths=False):
+    """Pool initializer: keep the reweighted CSR snapshot in this worker."""
+    WORKER_STATE['dk'] = test_dijkstra.CsrDijkstra(graph)
+    WORKER_STATE['potentials'] = potentials
+    WORKER_STATE['paths'] = paths
+
+
+def RunDijkstraChunk(sources):
+    """Return the min original-weight distance from any of the sources.
+
+    Also returns a list of (source, pred row) if the pool was started with
+    paths.
+    """
+    dk, potentials = WORKER_STATE['dk'], WORKER_STATE['potentials']
+    infinite = dk.infinite
+    min_distance = None
+    preds = []
+    for source in sources:
+        dist, pred = dk.Search(source)
+        source_min = min(dist[dest]-potentials[source]+potentials[dest]
+                         for dest in xrange(len(dist))
+                         if dist[dest] != infinite)
+        if min_distance is None or source_min < min_distance:
+            min_distance = source_min
+        if WORKER_STATE['paths']:
+            preds.append((source, array.array('i', pred)))
+    return min_distance, preds
+
+
 class Johnson(object):
     BELLMAN_FORD_SOURCE = 0
 
-    def __init__(self):
+    def __init__(self, processes=None, chunk_size=None, paths=False,
+                 queue_bellman_ford=False):
         self.graph = collections.defaultdict(dict)
-        self.bf = BellmanFord()
+        self.bf = QueueBellmanFord() if queue_bellman_ford else BellmanFord()
         self.dk = test_dijkstra.Dijkstra()
+        # Run the per-source Dijkstra in a process pool if processes > 1.
+        self.processes = processes
+        self.chunk_size = chunk_size
+        # With paths, keep a flat n x n matrix of predecessor node ids
+        # (4 bytes per pair) assembled from the per-source pred arrays.
+        self.paths = paths
+        self.node_list, self.node_ids = [], {}
+        self.pred = None
 
     def Add(self, node1, node2, cost):
         self.graph[node1][node2] = cost
         self.bf.Add(node1, node2, cost)
 
+    def GetNodes(self):
+        return sorted(set(self.graph).union(
+            *(node_info.keys() for node_info in self.graph.values())))
+
+    def GetPath(self, node1, node2):
+        """Return the nodes of a shortest path, or [] if unreachable."""
+        if self.pred is None:
+            raise Error('No pred matrix; run GetSSP with paths.')
+        i, j = self.node_ids[node1], self.node_ids[node2]
+        row = i * len(self.node_list)
+        if i != j and self.pred[row+j] < 0:
+            return []
+        path = [node2]
+        while j != i:
+            j = self.pred[row+j]
+            path.append(self.node_list[j])
+        path.reverse()
+        return path
+
     def GetSSP(self):
         # Compute shortest shortest path, i.e. all-pair shortest paths and return
         # the smallest one.  
         self.RunBellmanFord()
         return self.RunDijkstra()
 
+    def InitPred(self):
+        self.node_list = self.GetNodes()
+        self.node_ids = dict(
+            (node, i) for i, node in enumerate(self.node_list))
+        self.pred = array.array('i', [-1]) * (len(self.node_list) ** 2)
+
     def RunBellmanFord(self):
         for node in self.graph:
             self.bf.Add(self.BELLMAN_FORD_SOURCE, node, 0)
         self.bf.ShortestPaths(self.BELLMAN_FORD_SOURCE)
 
+    def GetCsrSnapshot(self):
+        """Return (nodes, CsrGraph, potentials) of the reweighted graph.
+
+        nodes[i] is the original node of CSR node id i.
+        """
+        bf_result = self.bf.current_a
+        nodes = self.GetNodes()
+        node_ids = dict((node, i) for i, node in enumerate(nodes))
+        graph = test_dijkstra.CsrGraph.FromEdges(
+            ((node_ids[node], node_ids[neighbor],
+              cost+bf_result[node]-bf_result[neighbor])
+             for node, node_info in self.graph.iteritems()
+             for neighbor, cost in node_info.iteritems()),
+            num_nodes=len(nodes))
+        potentials = [bf_result[node] for node in nodes]
+        return nodes, graph, potentials
+
     def RunDijkstra(self):
+        if self.processes and self.processes > 1:
+            return self.RunParallelDijkstra()
         bf_result = self.bf.current_a
         for node , node_info in self.graph.items():
             for neighbor, cost in node_info.items():
                 # Add reweighted edges.
                 self.dk.AddAdjacency(
                     node, neighbor, cost+bf_result[node]-bf_result[neighbor])
+        if self.paths:
+            self.InitPred()
         distances = []
         for node in self.graph:
             res = self.dk.GetSP(node)
             # Get the min distance from this node.
             distances.append(min(res[dest].dist-bf_result[node]+bf_result[dest]
                                  for dest in res))
+            if self.paths:
+                row = self.node_ids[node] * len(self.node_list)
+                for dest in res:
+                    if dest != node:
+                        self.pred[row+self.node_ids[dest]] = self.node_ids[
+                            res[dest].pred]
         return min(distances)
 
+    def RunParallelDijkstra(self):
+        # The reweighted graph is read-only from here on, so each worker gets
+        # one CSR snapshot at start-up and tasks are just chunks of sources.
+        nodes, graph, potentials = self.GetCsrSnapshot()
+        node_ids = dict((node, i) for i, node in enumerate(nodes))
+        sources = [node_ids[node] for node in self.graph]
+        chunk_size = self.chunk_size or max(
+            1, len(sources) // (self.processes * 4))
+        chunks = [sources[i:i+chunk_size]
+                  for i in xrange(0, len(sources), chunk_size)]
+        if self.paths:
+            self.InitPred()
+        pool = multiprocessing.Pool(self.processes,
+                                    initializer=InitDijkstraWorker,
+                                    initargs=(graph, potentials, self.paths))
+        try:
+            min_distance = None
+            size = len(nodes)
+            for chunk_min, preds in pool.imap_unordered(
+                RunDijkstraChunk, chunks):
+                if min_distance is None or chunk_min < min_distance:
+                    min_distance = chunk_min
+                # CSR ids follow the same sorted node order as self.pred.
+                for source, pred in preds:
+                    self.pred[source*size:(source+1)*size] = pred
+            return min_distance
+        finally:
+            pool.close()
+            pool.join()
+
 
 class BellmanFordTest(unittest2.TestCase):
     
@@ -242,6 +639,68 @@ class BellmanFordTest(unittest2.TestCase):
         self.assertEqual(expect, bf.ShortestPaths(2))
 
 
+class QueueBellmanFordTest(unittest2.TestCase):
+
+    def testSingleEdge(self):
+        bf = QueueBellmanFord()
+        bf.Add(1, 2, 1)
+        self.assertEqual({1: 0, 2: 1}, bf.ShortestPaths(1))
+
+    def testNegativeCycle1(self):
+        bf = QueueBellmanFord()
+        bf.Add(1, 2, 1)
+        bf.Add(2, 1, -2)
+        with self.assertRaises(NegativeCycleError):
+            bf.ShortestPaths(2)
+
+    def testNegativeCycle2(self):
+        bf = QueueBellmanFord()
+        edges = [(1, 2, 5), (1, 3, -2),
+                 (2, 4, 1),
+                 (3, 2, 2),
+                 (4, 3, 2), (4, 5, -7), (4, 6, 3),
+                 (5, 3, 3), (5, 6, 10)]
+        for edge in edges:
+            bf.Add(*edge)
+        with self.assertRaises(NegativeCycleError):
+            bf.ShortestPaths(1)
+
+    def testGraph2(self):
+        edges = [(1, 2, 6), (1, 4, 7),
+                 (2, 3, 5), (2, 4, 8), (2, 5, -4),
+                 (3, 2, -2),
+                 (4, 3, -3), (4, 5, 9),
+                 (5, 1, 2), (5, 3, 7)]
+        for source, expect in [(1, {1: 0, 2: 2, 3: 4, 4: 7, 5: -2}),
+                               (2, {1: -2, 2: 0, 3: 2, 4: 5, 5: -4})]:
+            bf = QueueBellmanFord()
+            for edge in edges:
+                bf.Add(*edge)
+            self.assertEqual(expect, bf.ShortestPaths(source))
+
+    def testNegativeCycleReport(self):
+        bf = QueueBellmanFord()
+        edges = [(1, 2, 1), (2, 3, 1), (3, 4, -3), (4, 2, 1), (4, 5, 1)]
+        for edge in edges:
+            bf.Add(*edge)
+        with self.assertRaises(NegativeCycleError) as cm:
+            bf.ShortestPaths(1)
+        cycle, cost = str(cm.exception).split('; ')
+        self.assertEqual(set(['2', '3', '4']),
+                         set(cycle.split(': ')[1].split('<-')))
+        self.assertEqual('cost: -1', cost)
+
+    def testRelaxations(self):
+        # A long path visited in order converges in one sweep per edge.
+        bf, queue_bf = BellmanFord(), QueueBellmanFord()
+        for node in xrange(1, 200):
+            bf.Add(node, node+1, 1)
+            queue_bf.Add(node, node+1, 1)
+        self.assertEqual(bf.ShortestPaths(1), queue_bf.ShortestPaths(1))
+        self.assertEqual(199, queue_bf.stats['relaxations'])
+        self.assertEqual(queue_bf.current_pred, bf.current_pred)
+
+
 class FloydWarshallTest(unittest2.TestCase):
 
     def testGraph1(self):
@@ -311,6 +770,192 @@ class FloydWarshallTest(unittest2.TestCase):
         print min([min(node_info.values()) for node_info in fw.current_a.values()])
 
 
+@unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+class NumpyFloydWarshallTest(unittest2.TestCase):
+
+    def testGraph1(self):
+        fw = NumpyFloydWarshall()
+        edges = [(1, 2, 2), (1, 3, 4),
+                 (2, 3, 1), (2, 4, 2),
+                 (3, 5, 4),
+                 (4, 5, 2)]
+        for edge in edges:
+            fw.Add(*edge)
+        self.assertEqual(0, fw.GetSSP())
+        self.assertEqual(6, fw.GetDistance(1, 5))
+        self.assertIsNone(fw.GetDistance(5, 1))
+
+    def testGraph2(self):
+        for dtype in (None, numpy.int64, numpy.float32):
+            fw = NumpyFloydWarshall(dtype=dtype)
+            edges = [(1, 4, 2),
+                     (2, 1, 6), (2, 3, 3),
+                     (3, 1, 4), (3, 4, 5),
+                     (4, 2, -7), (4, 3, -3)]
+            for edge in edges:
+                fw.Add(*edge)
+            self.assertEqual(-7, fw.GetSSP())
+
+    def testGraph2APSP(self):
+        edges = [(1, 2, 6), (1, 4, 7),
+                 (2, 3, 5), (2, 4, 8), (2, 5, -4),
+                 (3, 2, -2),
+                 (4, 3, -3), (4, 5, 9),
+                 (5, 1, 2), (5, 3, 7)]
+        for dtype in (None, numpy.int64):
+            fw = NumpyFloydWarshall(dtype=dtype)
+            for edge in edges:
+                fw.Add(*edge)
+            fw.ShortestPaths()
+            expect = {1: 0, 2: 2, 3: 4, 4: 7, 5: -2}
+            self.assertEqual(expect, dict(
+                (node, fw.GetDistance(1, node)) for node in expect))
+
+    def testNegativeCycle(self):
+        fw = NumpyFloydWarshall()
+        fw.Add(1, 2, 1)
+        fw.Add(2, 1, -2)
+        fw.Add(2, 3, 1)
+        with self.assertRaises(NegativeCycleError):
+            fw.GetSSP()
+
+    def testRandom(self):
+        random.seed(3)
+        for _ in xrange(10):
+            fw, np_fw = FloydWarshall(), NumpyFloydWarshall(dtype=numpy.int64)
+            edges = dict(((random.randint(1, 12), random.randint(1, 12)),
+                          random.randint(0, 20)) for _ in xrange(40))
+            for (node1, node2), cost in edges.items():
+                if node1 != node2:
+                    fw.Add(node1, node2, cost)
+                    np_fw.Add(node1, node2, cost)
+            fw.ShortestPaths()
+            np_fw.ShortestPaths()
+            for node1 in fw.nodes:
+                for node2 in fw.nodes:
+                    self.assertEqual(fw.current_a[node1].get(node2),
+                                     np_fw.GetDistance(node1, node2))
+
+
+@unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+class BlockedFloydWarshallTest(unittest2.TestCase):
+
+    def AddRandomEdges(self, fws, nodes, edges):
+        random.seed(4)
+        for _ in xrange(edges):
+            edge = (random.randint(1, nodes), random.randint(1, nodes),
+                    random.randint(0, 100))
+            for fw in fws:
+                fw.Add(*edge)
+
+    def testInvalidTileSize(self):
+        with self.assertRaises(Error):
+            BlockedFloydWarshall(tile_size=0)
+
+    def testGraph2(self):
+        for tile_size in (1, 2, 3, 10):
+            fw = BlockedFloydWarshall(tile_size=tile_size)
+            edges = [(1, 4, 2),
+                     (2, 1, 6), (2, 3, 3),
+                     (3, 1, 4), (3, 4, 5),
+                     (4, 2, -7), (4, 3, -3)]
+            for edge in edges:
+                fw.Add(*edge)
+            self.assertEqual(-7, fw.GetSSP())
+
+    def testNegativeCycle(self):
+        fw = BlockedFloydWarshall(tile_size=2)
+        for edge in [(1, 2, 1), (2, 3, 1), (3, 4, 1), (4, 1, -4)]:
+            fw.Add(*edge)
+        with self.assertRaises(NegativeCycleError):
+            fw.GetSSP()
+
+    def testRandom(self):
+        fws = [NumpyFloydWarshall(dtype=numpy.int64),
+               BlockedFloydWarshall(tile_size=7, dtype=numpy.int64),
+               BlockedFloydWarshall(tile_size=16, threads=3,
+                                    dtype=numpy.int64)]
+        self.AddRandomEdges(fws, 50, 300)
+        for fw in fws:
+            fw.ShortestPaths()
+        for fw in fws[1:]:
+            self.assertTrue((fws[0].dist == fw.dist).all())
+
+
+class GetPathTest(unittest2.TestCase):
+    EDGES = [(1, 2, 6), (1, 4, 7),
+             (2, 3, 5), (2, 4, 8), (2, 5, -4),
+             (3, 2, -2),
+             (4, 3, -3), (4, 5, 9),
+             (5, 1, 3), (5, 3, 7),
+             (6, 1, 1)]
+
+    def CheckPaths(self, get_path):
+        costs = dict(((node1, node2), cost) for node1, node2, cost in self.EDGES)
+        self.assertEqual([1, 4, 3, 2, 5], get_path(1, 5))
+        self.assertEqual([3, 2, 5, 1], get_path(3, 1))
+        self.assertEqual([6, 1, 4, 3], get_path(6, 3))
+        self.assertEqual([2], get_path(2, 2))
+        self.assertEqual([], get_path(1, 6))
+        bf = BellmanFord()
+        for edge in self.EDGES:
+            bf.Add(*edge)
+        for source in xrange(1, 7):
+            bf.current_a, bf.current_pred = {}, {}
+            expect = bf.ShortestPaths(source)
+            for dest in xrange(1, 7):
+                path = get_path(source, dest)
+                self.assertEqual(len(bf.GetPath(dest)) > 0, len(path) > 0)
+                if dest in expect:
+                    self.assertEqual([source, dest], [path[0], path[-1]])
+                    self.assertEqual(expect[dest], sum(
+                        costs[edge] for edge in zip(path, path[1:])))
+
+    def testBellmanFord(self):
+        bf = BellmanFord()
+        for edge in self.EDGES:
+            bf.Add(*edge)
+        bf.ShortestPaths(1)
+        self.assertEqual([1, 4, 3, 2, 5], bf.GetPath(5))
+        self.assertEqual([1], bf.GetPath(1))
+        self.assertEqual([], bf.GetPath(6))
+
+    def testNoPaths(self):
+        fw = FloydWarshall()
+        fw.Add(1, 2, 1)
+        fw.ShortestPaths()
+        with self.assertRaises(Error):
+            fw.GetPath(1, 2)
+
+    def testFloydWarshall(self):
+        fw = FloydWarshall(paths=True)
+        for edge in self.EDGES:
+            fw.Add(*edge)
+        fw.ShortestPaths()
+        self.assertEqual(36, len(fw.next_hop))
+        self.CheckPaths(fw.GetPath)
+
+    @unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+    def testNumpyFloydWarshall(self):
+        for fw in (NumpyFloydWarshall(paths=True),
+                   NumpyFloydWarshall(dtype=numpy.int64, paths=True),
+                   BlockedFloydWarshall(tile_size=2, paths=True)):
+            for edge in self.EDGES:
+                fw.Add(*edge)
+            fw.ShortestPaths()
+            self.assertEqual(numpy.int32, fw.next_hop.dtype)
+            self.CheckPaths(fw.GetPath)
+
+    def testJohnson(self):
+        for processes in (None, 2):
+            js = Johnson(processes=processes, paths=True)
+            for edge in self.EDGES:
+                js.Add(*edge)
+            self.assertEqual(-9, js.GetSSP())
+            self.assertEqual(36, len(js.pred))
+            self.CheckPaths(js.GetPath)
+
+
 class ModifyFloydWarshallTest(unittest2.TestCase):
 
     def testPS3G1(self):
@@ -380,6 +1025,29 @@ class FloydWarshallHWTest(unittest2.TestCase):
         self.assertEqual(-19, fw.GetSSP())
 
 
+@unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+class NumpyFloydWarshallHWTest(FloydWarshallHWTest):
+
+    def AddGraph(self, filename):
+        with open(filename, 'r') as fd:
+            _, edges = fd.readline().split()
+            edges = int(edges)
+            fw = NumpyFloydWarshall()
+            for _ in range(edges):
+                fw.Add(*[int(i) for i in fd.readline().split()])
+        return fw
+
+    def testG1(self):
+        fw = self.AddGraph('g1.txt')
+        with self.assertRaises(NegativeCycleError):
+            fw.GetSSP()
+
+    def testG2(self):
+        fw = self.AddGraph('g2.txt')
+        with self.assertRaises(NegativeCycleError):
+            fw.GetSSP()
+
+
 class JohnsonTest(unittest2.TestCase):
 
     def testGraph1(self):
@@ -402,14 +1070,27 @@ class JohnsonTest(unittest2.TestCase):
             js.Add(*edge)
         self.assertEqual(-7, js.GetSSP())
 
+    def testParallel(self):
+        edges = [(1, 4, 2),
+                 (2, 1, 6), (2, 3, 3),
+                 (3, 1, 4), (3, 4, 5),
+                 (4, 2, -7), (4, 3, -3),
+                 (5, 6, -9)]
+        for chunk_size in (None, 1, 10):
+            js = Johnson(processes=2, chunk_size=chunk_size)
+            for edge in edges:
+                js.Add(*edge)
+            self.assertEqual(-9, js.GetSSP())
+
 
 class JohnsonHWTest(unittest2.TestCase):
 
-    def AddGraph(self, filename):
+    def AddGraph(self, filename, processes=None, queue_bellman_ford=False):
         with open(filename, 'r') as fd:
             _, edges = fd.readline().split()
             edges = int(edges)
-            js = Johnson()
+            js = Johnson(processes=processes,
+                         queue_bellman_ford=queue_bellman_ford)
             for _ in range(edges):
                 js.Add(*[int(i) for i in fd.readline().split()])
         return js
@@ -428,6 +1109,18 @@ class JohnsonHWTest(unittest2.TestCase):
         js = self.AddGraph('g3.txt')
         self.assertEqual(-19, js.GetSSP())
 
+    def testQueueBellmanFord(self):
+        for filename in ('g1.txt', 'g2.txt'):
+            js = self.AddGraph(filename, queue_bellman_ford=True)
+            with self.assertRaises(NegativeCycleError):
+                js.GetSSP()
+        js = self.AddGraph('g3.txt', queue_bellman_ford=True)
+        self.assertEqual(-19, js.GetSSP())
+
+    def testG3Parallel(self):
+        js = self.AddGraph('g3.txt', processes=multiprocessing.cpu_count()+1)
+        self.assertEqual(-19, js.GetSSP())
+
 
 if __name__ == '__main__':
     unittest2.main()
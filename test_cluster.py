@@ -1,11 +1,18 @@
 #!/usr/bin/python
 
 
+import array
 import collections
 import itertools
 import operator
+import random
 import unittest2
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class Error(Exception):
     """Base error class."""
@@ -49,14 +56,81 @@ class UnionFind(object):
         else:
             self.Join(leader2, leader1)
 
+    @property
+    def components(self):
+        return len(self.leaders)
+
+
+class ArrayUnionFind(object):
+    """Disjoint sets of ints 0..n-1 in flat int32 parent/rank arrays.
+
+    Uses union by rank and path halving.  parent[item] is -1 until item is
+    added, so components only counts added items.  The arrays grow on
+    demand like the dict-based UnionFind.
+    """
+
+    def __init__(self, size=0):
+        self.parent = array.array('i', [-1]) * size
+        self.rank = array.array('i', [0]) * size
+        self.components = 0
+
+    def Add(self, items):
+        if items is None:
+            raise Error('Invalid items: {}'.format(items))
+        if not isinstance(items, (list, xrange)):
+            items = [items]
+        parent = self.parent
+        for item in items:
+            if item < 0:
+                raise Error('Invalid item: {}'.format(item))
+            if item >= len(parent):
+                grow = max(item + 1, 2 * len(parent)) - len(parent)
+                parent.extend(array.array('i', [-1]) * grow)
+                self.rank.extend(array.array('i', [0]) * grow)
+            if parent[item] < 0:
+                parent[item] = item
+                self.components += 1
+
+    def Find(self, item):
+        parent = self.parent
+        if not 0 <= item < len(parent) or parent[item] < 0:
+            self.Add(item)
+            return item
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def Union(self, item1, item2):
+        """Join the sets of item1 and item2; return False if already one."""
+        leader1, leader2 = self.Find(item1), self.Find(item2)
+        if leader1 == leader2:
+            return False
+        rank = self.rank
+        if rank[leader1] < rank[leader2]:
+            leader1, leader2 = leader2, leader1
+        self.parent[leader2] = leader1
+        if rank[leader1] == rank[leader2]:
+            rank[leader1] += 1
+        self.components -= 1
+        return True
+
+    def UnionMany(self, items1, items2):
+        """Union items1[i] with items2[i] for all i; return the joins made."""
+        joins = 0
+        for item1, item2 in itertools.izip(items1, items2):
+            if self.Union(int(item1), int(item2)):
+                joins += 1
+        return joins
+
 
 class Cluster1(object):
 
-    def __init__(self, k):
+    def __init__(self, k, uf=None):
         if not isinstance(k, int):
             raise Error('Invalid k: {}'.format(k))
         self.k = k
-        self.uf = UnionFind()
+        self.uf = UnionFind() if uf is None else uf
         self.edges = []
         
     def Add(self, node1, node2, cost):
@@ -72,7 +146,7 @@ class Cluster1(object):
 
     def GetClusters(self):
         sorted_edges = sorted(self.edges, reverse=True)
-        while len(self.uf.leaders) > self.k:
+        while self.uf.components > self.k:
             _, node1, node2 = sorted_edges.pop()
             self.uf.Union(node1, node2)
         return sorted_edges
@@ -92,13 +166,53 @@ class Cluster1(object):
         results['max_spacing'] = max_spacing
         return results
 
+    def GetSpacingCurve(self):
+        """Return spacings where spacings[k] is the max spacing of k clusters.
+
+        The edges are sorted once and Kruskal runs once, recording the cost
+        of every merge.  Going from k + 1 to k clusters takes merge number
+        n - k, so the max spacing of k clusters is the cost of the next
+        merge, merge_costs[n - k].  spacings[k] is None where no such merge
+        exists, e.g. k = 1.
+        """
+        node_ids = {}
+        for _, node1, node2 in self.edges:
+            for node in (node1, node2):
+                if node not in node_ids:
+                    node_ids[node] = len(node_ids)
+        num_nodes = len(node_ids)
+        if numpy is not None:
+            order = numpy.argsort(
+                numpy.array([cost for cost, _, _ in self.edges]),
+                kind='mergesort')
+        else:
+            order = sorted(xrange(len(self.edges)),
+                           key=lambda i: self.edges[i][0])
+        uf = ArrayUnionFind(num_nodes)
+        uf.Add(xrange(num_nodes))
+        merge_costs = []
+        for i in order:
+            cost, node1, node2 = self.edges[i]
+            if uf.Union(node_ids[node1], node_ids[node2]):
+                merge_costs.append(cost)
+                if len(merge_costs) == num_nodes - 1:
+                    break
+        spacings = [None] * (num_nodes + 1)
+        for k in xrange(max(num_nodes - len(merge_costs) + 1, 1),
+                        num_nodes + 1):
+            spacings[k] = merge_costs[num_nodes - k]
+        return spacings
+
 
 class BigCluster(object):
     # Convert hamming label to integer/binary.  This is ~10x faster.
 
-    def __init__(self, label_size, min_distance):
-        self.uf = UnionFind()
+    def __init__(self, label_size, min_distance, uf=None):
+        # Labels are joined by their dense ids in label_ids, so an
+        # ArrayUnionFind stays as small as the number of distinct labels.
+        self.uf = UnionFind() if uf is None else uf
         self.labels = set()
+        self.label_ids = {}
         self.min_distance = min_distance
         self.label_size = label_size
 
@@ -147,18 +261,76 @@ class BigCluster(object):
         return results
 
     def GetMaxK(self):
-        for label in self.labels:
-            self.uf.Add(label)
+        self.label_ids = dict(
+            (label, i) for i, label in enumerate(self.labels))
+        self.uf.Add(range(len(self.label_ids)))
         for get_labels_distance in (self.GetAllLabelsDistance1,
                                    self.GetAllLabelsDistance2):
             self.JoinLabelDistance(get_labels_distance)
-        return len(self.uf.leaders)
+        return self.uf.components
 
     def JoinLabelDistance(self, get_labels_distance):
-        for label in self.labels:
+        label_ids = self.label_ids
+        for label, label_id in label_ids.iteritems():
             for d_label in get_labels_distance(label):
-                if d_label in self.labels:
-                    self.uf.Union(label, d_label)
+                if d_label in label_ids:
+                    self.uf.Union(label_id, label_ids[d_label])
+
+
+class FastBigCluster(BigCluster):
+    """BigCluster that joins all labels within min_distance - 1 bits.
+
+    The XOR masks of every bit pattern with 1..radius set bits are built
+    once.  With NumPy each mask is applied to the whole sorted label array
+    and looked up with one searchsorted call; otherwise every label ^ mask
+    is probed in label_ids.
+    """
+
+    def __init__(self, label_size, min_distance, uf=None):
+        super(FastBigCluster, self).__init__(
+            label_size, min_distance,
+            uf=ArrayUnionFind() if uf is None else uf)
+
+    def GetMasks(self, radius):
+        masks = []
+        for distance in xrange(1, radius + 1):
+            for positions in itertools.combinations(
+                xrange(self.label_size), distance):
+                masks.append(sum(1 << position for position in positions))
+        return masks
+
+    def GetMaxK(self):
+        masks = self.GetMasks(self.min_distance - 1)
+        if numpy is None:
+            self.label_ids = dict(
+                (label, i) for i, label in enumerate(self.labels))
+            self.uf.Add(xrange(len(self.label_ids)))
+            self.JoinLabelMasks(masks)
+        else:
+            labels = numpy.array(sorted(self.labels), dtype=numpy.int64)
+            self.uf.Add(xrange(len(labels)))
+            self.JoinSortedLabelMasks(labels, masks)
+        return self.uf.components
+
+    def JoinLabelMasks(self, masks):
+        label_ids = self.label_ids
+        for label, label_id in label_ids.iteritems():
+            for mask in masks:
+                d_label = label ^ mask
+                # Check each pair once, from the smaller label.
+                if d_label > label and d_label in label_ids:
+                    self.uf.Union(label_id, label_ids[d_label])
+
+    def JoinSortedLabelMasks(self, labels, masks):
+        if not len(labels):
+            return
+        for mask in masks:
+            d_labels = labels ^ mask
+            d_ids = numpy.searchsorted(labels, d_labels)
+            d_ids[d_ids == len(labels)] = 0
+            # Check each pair once, from the smaller label.
+            found = (labels[d_ids] == d_labels) & (d_labels > labels)
+            self.uf.UnionMany(numpy.nonzero(found)[0], d_ids[found])
 
 
 class UnionFindTest(unittest2.TestCase):
@@ -202,6 +374,57 @@ class UnionFindTest(unittest2.TestCase):
         self.assertEqual(leader, uf.Find(item))
 
 
+class ArrayUnionFindTest(unittest2.TestCase):
+
+    def testAddInvalidItems(self):
+        with self.assertRaises(Error):
+            ArrayUnionFind().Add(None)
+        with self.assertRaises(Error):
+            ArrayUnionFind().Add(-1)
+
+    def testAddItems(self):
+        uf = ArrayUnionFind()
+        uf.Add([3, 5, 5])
+        self.assertEqual(2, uf.components)
+        for item in (3, 5):
+            self.assertEqual(uf.Find(item), item)
+        # Find adds unknown items like UnionFind does.
+        self.assertEqual(9, uf.Find(9))
+        self.assertEqual(3, uf.components)
+
+    def testUnion(self):
+        uf = ArrayUnionFind(5)
+        uf.Add(range(5))
+        self.assertTrue(uf.Union(1, 2))
+        self.assertFalse(uf.Union(2, 1))
+        self.assertTrue(uf.Union(3, 2))
+        self.assertEqual(3, uf.components)
+        self.assertEqual(uf.Find(1), uf.Find(3))
+        self.assertNotEqual(uf.Find(1), uf.Find(4))
+
+    def testUnionMany(self):
+        uf = ArrayUnionFind()
+        uf.Add(range(6))
+        self.assertEqual(3, uf.UnionMany([0, 1, 2, 4], [1, 2, 0, 5]))
+        self.assertEqual(3, uf.components)
+
+    def testRandom(self):
+        random.seed(1)
+        uf, array_uf = UnionFind(), ArrayUnionFind()
+        uf.Add(range(200))
+        array_uf.Add(range(200))
+        for _ in xrange(150):
+            item1, item2 = random.randint(0, 199), random.randint(0, 199)
+            uf.Union(item1, item2)
+            array_uf.Union(item1, item2)
+            self.assertEqual(uf.components, array_uf.components)
+        for item1 in xrange(200):
+            for item2 in xrange(item1):
+                self.assertEqual(
+                    uf.Find(item1) == uf.Find(item2),
+                    array_uf.Find(item1) == array_uf.Find(item2))
+
+
 class Cluster1Test(unittest2.TestCase):
     K = 4
 
@@ -302,6 +525,37 @@ class Cluster1Test(unittest2.TestCase):
         results = c1.GetMaxSpacing()
         self.assertEqual(3, results['max_spacing'])
 
+    def testSpacingCurve(self):
+        inputs = ['1 2 3', '1 3 80', '1 4 88', '1 5 65', '1 6 92',
+                  '2 3 23', '2 4 48', '2 5 27', '2 6 74',
+                  '3 4 28', '3 5 6', '3 6 38',
+                  '4 5 32', '4 6 61',
+                  '5 6 23', '7 8 5']
+        spacings = None
+        for k in xrange(1, 9):
+            c1 = Cluster1(k)
+            for input in inputs:
+                node1, node2, cost = input.split()
+                c1.Add(node1, node2, int(cost))
+            if spacings is None:
+                spacings = c1.GetSpacingCurve()
+                self.assertEqual(9, len(spacings))
+            if k < 3:
+                # Two connected components cannot form a single cluster.
+                self.assertIsNone(spacings[k])
+                continue
+            self.assertEqual(c1.GetMaxSpacing()['max_spacing'], spacings[k])
+
+    def testArrayUnionFind(self):
+        c1 = Cluster1(self.K, uf=ArrayUnionFind())
+        inputs = ['1 2 1', '2 3 4', '3 4 1', '4 5 7', '5 6 1',
+                  '6 7 3', '7 8 1', '7 9 2', '8 9 1', '8 1 5']
+        for input in inputs:
+            node1, node2, cost = input.split()
+            c1.Add(node1, node2, int(cost))
+        results = c1.GetMaxSpacing()
+        self.assertEqual(3, results['max_spacing'])
+
 
 class Cluster1HWTest(unittest2.TestCase):
     K = 4
@@ -324,6 +578,21 @@ class Cluster1HWTest(unittest2.TestCase):
         results = c1.GetMaxSpacing()
         self.assertEqual(106, results['max_spacing'])
 
+    def testSpacingCurve(self):
+        c1 = Cluster1(self.K)
+        for input in self.inputs:
+            c1.Add(*input)
+        spacings = c1.GetSpacingCurve()
+        self.assertEqual(106, spacings[self.K])
+        self.assertIsNone(spacings[1])
+
+    def testArrayUnionFind(self):
+        c1 = Cluster1(self.K, uf=ArrayUnionFind())
+        for input in self.inputs:
+            c1.Add(*input)
+        results = c1.GetMaxSpacing()
+        self.assertEqual(106, results['max_spacing'])
+
 
 class BigClusterTest(unittest2.TestCase):
     MIN_DISTANCE = 3
@@ -352,6 +621,67 @@ class BigClusterTest(unittest2.TestCase):
                 bc.Add(i, fd.readline())
         self.assertEqual(1, bc.GetMaxK())
 
+    def testArrayUnionFind(self):
+        for file_name, max_k in (('test_cluster1.txt', 4),
+                                 ('test_cluster2.txt', 45),
+                                 ('test_cluster3.txt', 1)):
+            with open(file_name, 'r') as fd:
+                nodes, label_size = fd.readline().split()
+                bc = BigCluster(int(label_size), self.MIN_DISTANCE,
+                                uf=ArrayUnionFind())
+                for i in range(int(nodes)):
+                    bc.Add(i, fd.readline())
+            self.assertEqual(max_k, bc.GetMaxK())
+
+
+class FastBigClusterTest(unittest2.TestCase):
+    MIN_DISTANCE = 3
+
+    def testCluster(self):
+        for file_name, max_k in (('test_cluster1.txt', 4),
+                                 ('test_cluster2.txt', 45),
+                                 ('test_cluster3.txt', 1)):
+            with open(file_name, 'r') as fd:
+                nodes, label_size = fd.readline().split()
+                bc = FastBigCluster(int(label_size), self.MIN_DISTANCE)
+                for i in range(int(nodes)):
+                    bc.Add(i, fd.readline())
+            self.assertEqual(max_k, bc.GetMaxK())
+
+    def testMasks(self):
+        bc = FastBigCluster(24, self.MIN_DISTANCE)
+        masks = bc.GetMasks(2)
+        self.assertEqual(24 + 276, len(set(masks)))
+        self.assertEqual(set([1, 2]),
+                         set(bin(mask).count('1') for mask in masks))
+
+    def testRadius(self):
+        random.seed(1)
+        labels = [random.getrandbits(12) for _ in xrange(300)]
+        for min_distance in (1, 2, 4, 5):
+            bc = FastBigCluster(12, min_distance)
+            for i, label in enumerate(labels):
+                bc.Add(i, ' '.join(bin(label)[2:].zfill(12)))
+            uf = UnionFind()
+            uf.Add(labels)
+            for label1, label2 in itertools.combinations(labels, 2):
+                if bin(label1 ^ label2).count('1') < min_distance:
+                    uf.Union(label1, label2)
+            self.assertEqual(uf.components, bc.GetMaxK())
+
+    def testSetProbe(self):
+        random.seed(2)
+        clusters = [FastBigCluster(10, 4), FastBigCluster(10, 4)]
+        for i in xrange(200):
+            label = ' '.join(bin(random.getrandbits(10))[2:].zfill(10))
+            for bc in clusters:
+                bc.Add(i, label)
+        bc = clusters[1]
+        bc.label_ids = dict((label, i) for i, label in enumerate(bc.labels))
+        bc.uf.Add(xrange(len(bc.label_ids)))
+        bc.JoinLabelMasks(bc.GetMasks(3))
+        self.assertEqual(clusters[0].GetMaxK(), bc.uf.components)
+
 
 class BigClusterHWTest(unittest2.TestCase):
     MIN_DISTANCE = 3
@@ -364,6 +694,23 @@ class BigClusterHWTest(unittest2.TestCase):
                 bc.Add(i, fd.readline())
         self.assertEqual(6118, bc.GetMaxK())
 
+    def testFast(self):
+        with open('clustering_big.txt', 'r') as fd:
+            nodes, label_size = fd.readline().split()
+            bc = FastBigCluster(int(label_size), self.MIN_DISTANCE)
+            for i in range(int(nodes)):
+                bc.Add(i, fd.readline())
+        self.assertEqual(6118, bc.GetMaxK())
+
+    def testArrayUnionFind(self):
+        with open('clustering_big.txt', 'r') as fd:
+            nodes, label_size = fd.readline().split()
+            bc = BigCluster(int(label_size), self.MIN_DISTANCE,
+                            uf=ArrayUnionFind())
+            for i in range(int(nodes)):
+                bc.Add(i, fd.readline())
+        self.assertEqual(6118, bc.GetMaxK())
+
 
 if __name__ == '__main__':
     unittest2.main()
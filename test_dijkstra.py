@@ -1,11 +1,24 @@
 #!/opt/local/bin/pypy
 
 
+import array
 import collections
 import heapq
+import itertools
+import math
+import random
 import sys
 import unittest2
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+INFINITE = sys.maxint
+NO_PRED = -1
+
 
 class Error(Exception):
     """Error class for this module."""
@@ -31,45 +44,748 @@ class SPInfo(object):
         return cmp(this_info, that_info)
 
 
+class CsrGraph(object):
+    """Compressed-sparse-row graph on integer node ids 0..num_nodes-1.
+
+    The out-edges of node are neighbors[offsets[node]:offsets[node+1]] with
+    the matching costs, so no Python object is kept per edge.
+    """
+
+    def __init__(self, num_nodes, offsets, neighbors, costs):
+        if len(offsets) != num_nodes + 1:
+            raise Error('Invalid offsets length: {}'.format(len(offsets)))
+        if len(neighbors) != len(costs):
+            raise Error('Mismatched neighbors/costs: {}/{}'.format(
+                len(neighbors), len(costs)))
+        self.num_nodes = num_nodes
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.costs = costs
+
+    def __contains__(self, node):
+        return isinstance(node, (int, long)) and 0 <= node < self.num_nodes
+
+    def __iter__(self):
+        return iter(xrange(self.num_nodes))
+
+    def __len__(self):
+        return self.num_nodes
+
+    def Adjacencies(self, node):
+        start, end = self.offsets[node], self.offsets[node+1]
+        return itertools.izip(self.neighbors[start:end], self.costs[start:end])
+
+    def Reverse(self):
+        """Return the graph with every edge reversed."""
+        sources = array.array('l', [0]) * len(self.neighbors)
+        for node in xrange(self.num_nodes):
+            for i in xrange(self.offsets[node], self.offsets[node+1]):
+                sources[i] = node
+        return CsrGraph.FromArrays(
+            self.neighbors, sources, self.costs, num_nodes=self.num_nodes,
+            typecode=self.costs.typecode)
+
+    @classmethod
+    def FromArrays(cls, sources, dests, costs, num_nodes=None,
+                   typecode='l'):
+        """Build the graph from parallel edge arrays with a counting sort."""
+        if num_nodes is None:
+            num_nodes = max(max(sources) if len(sources) else -1,
+                            max(dests) if len(dests) else -1) + 1
+        # Count out-degrees and turn them into row offsets.
+        offsets = array.array('l', [0]) * (num_nodes + 1)
+        for node in sources:
+            offsets[node+1] += 1
+        for node in xrange(num_nodes):
+            offsets[node+1] += offsets[node]
+        # Place every edge at the next free slot of its source row.
+        slots = array.array('l', offsets)
+        neighbors = array.array('l', [0]) * len(sources)
+        edge_costs = array.array(typecode, [0]) * len(sources)
+        for node, neighbor, cost in itertools.izip(sources, dests, costs):
+            slot = slots[node]
+            neighbors[slot] = neighbor
+            edge_costs[slot] = cost
+            slots[node] = slot + 1
+        return cls(num_nodes, offsets, neighbors, edge_costs)
+
+    @classmethod
+    def FromEdges(cls, edges, num_nodes=None, typecode='l'):
+        """Build the graph from an iterable of (node, neighbor, cost)."""
+        sources, dests = array.array('l'), array.array('l')
+        costs = array.array(typecode)
+        for node, neighbor, cost in edges:
+            sources.append(node)
+            dests.append(neighbor)
+            costs.append(cost)
+        return cls.FromArrays(sources, dests, costs, num_nodes=num_nodes,
+                              typecode=typecode)
+
+    @classmethod
+    def FromFile(cls, file_name, typecode='l'):
+        """Build the graph from the dijkstraData.txt adjacency-list format."""
+        sources, dests = array.array('l'), array.array('l')
+        costs = array.array(typecode)
+        convert = int if typecode in 'bBhHiIlL' else float
+        max_node = -1
+        with open(file_name, 'r') as fd:
+            for line in fd:
+                rec = line.split()
+                if not rec:
+                    continue
+                node = int(rec[0])
+                max_node = max(max_node, node)
+                for adj in rec[1:]:
+                    neighbor, cost = adj.split(',')
+                    sources.append(node)
+                    dests.append(int(neighbor))
+                    costs.append(convert(cost))
+        num_nodes = max(max_node, max(dests or [-1])) + 1
+        return cls.FromArrays(sources, dests, costs, num_nodes=num_nodes,
+                              typecode=typecode)
+
+
+class NodeMap(dict):
+    """Dict that returns a default value for missing nodes without storing it.
+
+    This lets the search loop index dict-backed and array-backed per-node
+    state the same way.
+    """
+
+    def __init__(self, default):
+        super(NodeMap, self).__init__()
+        self.default = default
+
+    def __missing__(self, node):
+        return self.default
+
+
+class IndexedHeap(object):
+    """Binary min-heap of (key, item) with decrease-key.
+
+    position maps item -> heap index and must return -1 for items that are
+    not in the heap, e.g. NodeMap(-1) or a flat array filled with -1.
+    """
+
+    def __init__(self, position=None):
+        self.keys = []
+        self.items = []
+        self.position = NodeMap(-1) if position is None else position
+
+    def __contains__(self, item):
+        return self.position[item] >= 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def DecreaseKey(self, key, item):
+        index = self.position[item]
+        if index < 0:
+            raise Error('Item not in heap: {}'.format(item))
+        if key > self.keys[index]:
+            raise Error('Cannot increase key of {}: {} > {}'.format(
+                item, key, self.keys[index]))
+        self.keys[index] = key
+        self.SiftUp(index)
+
+    def Pop(self):
+        if not self.items:
+            raise Error('Pop from empty heap.')
+        key, item = self.keys[0], self.items[0]
+        last_key, last_item = self.keys.pop(), self.items.pop()
+        self.position[item] = -1
+        if self.items:
+            self.keys[0], self.items[0] = last_key, last_item
+            self.position[last_item] = 0
+            self.SiftDown(0)
+        return key, item
+
+    def Push(self, key, item):
+        if item in self:
+            raise Error('Item already in heap: {}'.format(item))
+        self.keys.append(key)
+        self.items.append(item)
+        self.position[item] = len(self.items) - 1
+        self.SiftUp(len(self.items) - 1)
+
+    def SiftDown(self, index):
+        keys, items, position = self.keys, self.items, self.position
+        key, item = keys[index], items[index]
+        size = len(items)
+        child = 2 * index + 1
+        while child < size:
+            if child + 1 < size and keys[child+1] < keys[child]:
+                child += 1
+            if not keys[child] < key:
+                break
+            keys[index], items[index] = keys[child], items[child]
+            position[items[index]] = index
+            index, child = child, 2 * child + 1
+        keys[index], items[index] = key, item
+        position[item] = index
+
+    def SiftUp(self, index):
+        keys, items, position = self.keys, self.items, self.position
+        key, item = keys[index], items[index]
+        while index:
+            parent = (index - 1) // 2
+            if not key < keys[parent]:
+                break
+            keys[index], items[index] = keys[parent], items[parent]
+            position[items[index]] = index
+            index = parent
+        keys[index], items[index] = key, item
+        position[item] = index
+
+
+class SPResult(object):
+    """Read-only map of reached node -> SPInfo over flat dist/pred state.
+
+    SPInfo objects are only built on lookup, so a search over millions of
+    nodes keeps just the dist and pred arrays alive.
+    """
+
+    def __init__(self, dist, pred, infinite, no_pred):
+        self.dist = dist
+        self.pred = pred
+        self.infinite = infinite
+        self.no_pred = no_pred
+
+    def __contains__(self, node):
+        if isinstance(self.dist, dict):
+            return self.dist.get(node, self.infinite) != self.infinite
+        return (isinstance(node, (int, long)) and 0 <= node < len(self.dist)
+                and self.dist[node] != self.infinite)
+
+    def __getitem__(self, node):
+        if node not in self:
+            raise KeyError(node)
+        pred = self.pred[node]
+        return SPInfo(node, dist=self.dist[node],
+                      pred=None if pred == self.no_pred else pred)
+
+    def __iter__(self):
+        if isinstance(self.dist, dict):
+            nodes = self.dist.keys()
+        else:
+            nodes = xrange(len(self.dist))
+        return (node for node in nodes if self.dist[node] != self.infinite)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
 class Dijkstra(object):
     
-    def __init__(self):
+    def __init__(self, indexed_heap=False):
         self.graph = collections.defaultdict(list)
-        self.sp_info_map = {}
+        # Use IndexedHeap with decrease-key instead of lazy deletion.
+        self.indexed_heap = indexed_heap
+        self.infinite, self.no_pred = INFINITE, None
         self.heap = []
         self.shortest_distances = {}
+        self.stats = {}
+        # Built on demand for bidirectional search.
+        self.reverse_graph = None
+        # Node -> set of children in the shortest_distances tree.  Built on
+        # the first repair and kept in step by later ones.
+        self.children = None
 
     def AddAdjacency(self, node, neighbor=None, cost=None):
         if neighbor is None:
+            self.reverse_graph = None
             self.graph[node] = []
             return
         self.graph[node].append(Adjacency(neighbor, cost))
+        if neighbor not in self.graph:
+            # A sink is a node too, before any search touches it.
+            self.graph[neighbor] = []
+        if self.reverse_graph is not None:
+            self.reverse_graph[neighbor].append(Adjacency(node, cost))
+
+    def Adjacencies(self, node):
+        return ((adj.neighbor, adj.cost) for adj in self.graph[node])
+
+    def AStarSearch(self, source, target, heuristic):
+        """Run A* from source to target and return the (dist, pred) state.
+
+        heuristic(node, target) must be a consistent lower bound on the
+        distance from node to target, so a settled node is never reopened.
+        """
+        self.ResetStats(1)
+        adjacencies = self.Adjacencies
+        stats = self.stats
+        dist = self.NewArray(self.infinite, self.dist_typecode)
+        pred = self.NewArray(self.no_pred)
+        dist[source] = 0
+        # Entries are (dist + estimate, dist, node).
+        self.heap = heap = [(heuristic(source, target), 0, source)]
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap:
+            _, this_dist, this_node = heappop(heap)
+            if this_dist > dist[this_node]:
+                stats['stale pops'] += 1
+                continue
+            stats['settled nodes'] += 1
+            if this_node == target:
+                break
+            for neighbor, cost in adjacencies(this_node):
+                neighbor_dist = this_dist + cost
+                if neighbor_dist < dist[neighbor]:
+                    dist[neighbor] = neighbor_dist
+                    pred[neighbor] = this_node
+                    heappush(heap, (neighbor_dist + heuristic(neighbor, target),
+                                    neighbor_dist, neighbor))
+                    stats['heap pushes'] += 1
+        return dist, pred
+
+    def BidirectionalSearch(self, source, target):
+        """Search forward from source and backward from target together.
+
+        Returns (dist, meet, pred, succ) where meet is a node on a shortest
+        path, pred is the forward pred chain and succ the backward one.
+        """
+        self.ResetStats(2)
+        sides = []
+        for node, adjacencies in ((source, self.Adjacencies),
+                                  (target, self.ReverseAdjacencies)):
+            dist = self.NewArray(self.infinite, self.dist_typecode)
+            pred = self.NewArray(self.no_pred)
+            dist[node] = 0
+            sides.append(([(0, node)], dist, pred, adjacencies))
+        best, meet = self.infinite, None
+        if source == target:
+            best, meet = 0, source
+        forward, backward = sides
+        while forward[0] and backward[0]:
+            if forward[0][0][0] + backward[0][0][0] >= best:
+                # No unsettled node can lead to a shorter path.
+                break
+            if len(forward[0]) <= len(backward[0]):
+                this_side, that_side = forward, backward
+            else:
+                this_side, that_side = backward, forward
+            heap, dist, pred, adjacencies = this_side
+            that_dist = that_side[1]
+            this_dist, this_node = heapq.heappop(heap)
+            if this_dist > dist[this_node]:
+                self.stats['stale pops'] += 1
+                continue
+            self.stats['settled nodes'] += 1
+            for neighbor, cost in adjacencies(this_node):
+                neighbor_dist = this_dist + cost
+                if neighbor_dist < dist[neighbor]:
+                    dist[neighbor] = neighbor_dist
+                    pred[neighbor] = this_node
+                    heapq.heappush(heap, (neighbor_dist, neighbor))
+                    self.stats['heap pushes'] += 1
+                if (that_dist[neighbor] != self.infinite and
+                    neighbor_dist + that_dist[neighbor] < best):
+                    best, meet = neighbor_dist + that_dist[neighbor], neighbor
+        return best, meet, forward[2], backward[2]
+
+    def DeleteEdge(self, node, neighbor):
+        adjs = [adj for adj in self.graph[node] if adj.neighbor != neighbor]
+        if len(adjs) == len(self.graph[node]):
+            raise Error('No edge: {}->{}'.format(node, neighbor))
+        self.graph[node] = adjs
+        if self.reverse_graph is not None:
+            self.reverse_graph[neighbor] = [
+                adj for adj in self.reverse_graph[neighbor]
+                if adj.neighbor != node]
+
+    def GetChildren(self):
+        """Return the child index of the cached tree, building it once."""
+        if self.children is None:
+            res = self.shortest_distances
+            self.children = collections.defaultdict(set)
+            for node in res:
+                if res.pred[node] != self.no_pred:
+                    self.children[res.pred[node]].add(node)
+        return self.children
+
+    def GetPath(self, source, target, bidirectional=False, heuristic=None):
+        """Return (dist, path) of a shortest path from source to target.
+
+        The search stops as soon as target is settled.  Pass a heuristic
+        callback, e.g. EuclideanHeuristic or LandmarkHeuristic, to run A*
+        instead of plain Dijkstra.  Returns (self.infinite, []) if target is
+        unreachable.
+        """
+        for node in (source, target):
+            if node not in self.graph:
+                raise Error('Invalid node: {}'.format(node))
+        if bidirectional and heuristic is not None:
+            raise Error('Bidirectional A* is not supported.')
+        if bidirectional:
+            dist, meet, pred, succ = self.BidirectionalSearch(source, target)
+            if meet is None:
+                return self.infinite, []
+            path = self.PathFromPred(pred, meet)
+            path.reverse()
+            return dist, path + self.PathFromPred(succ, meet)[1:]
+        if heuristic is None:
+            dist, pred = self.Search(source, target=target)
+        else:
+            dist, pred = self.AStarSearch(source, target, heuristic)
+        if dist[target] == self.infinite:
+            return self.infinite, []
+        path = self.PathFromPred(pred, target)
+        path.reverse()
+        return dist[target], path
 
     def GetSP(self, node):
         if node not in self.graph:
             raise Error('Invalid node: {}'.format(node))
-        self.shortest_distances, self.sp_info_map = {}, {}
-        self.sp_info_map[node] = SPInfo(node, dist=0)
-        # Initialize the heap.
-        self.heap = [(0, self.sp_info_map[node])]
-        while self.heap:
-            _, sp_info = heapq.heappop(self.heap)
-            this_node = sp_info.node
-            if this_node in self.shortest_distances:
+        dist, pred = self.Search(node)
+        self.shortest_distances = SPResult(
+            dist, pred, self.infinite, self.no_pred)
+        self.children = None
+        return self.shortest_distances
+
+    def IndexedSearch(self, dist, pred, adjacencies, target=None):
+        stats = self.stats
+        heap = self.heap
+        while heap:
+            this_dist, this_node = heap.Pop()
+            stats['settled nodes'] += 1
+            if this_node == target:
+                break
+            for neighbor, cost in adjacencies(this_node):
+                neighbor_dist = this_dist + cost
+                if neighbor_dist < dist[neighbor]:
+                    dist[neighbor] = neighbor_dist
+                    pred[neighbor] = this_node
+                    if neighbor in heap:
+                        heap.DecreaseKey(neighbor_dist, neighbor)
+                        stats['decrease keys'] += 1
+                    else:
+                        heap.Push(neighbor_dist, neighbor)
+                        stats['heap pushes'] += 1
+
+    def LazySearch(self, dist, pred, adjacencies, target=None):
+        stats = self.stats
+        heap = self.heap
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap:
+            this_dist, this_node = heappop(heap)
+            if this_dist > dist[this_node]:
+                # A shorter entry for this node was already popped.
+                stats['stale pops'] += 1
+                continue
+            stats['settled nodes'] += 1
+            if this_node == target:
+                break
+            for neighbor, cost in adjacencies(this_node):
+                neighbor_dist = this_dist + cost
+                if neighbor_dist < dist[neighbor]:
+                    dist[neighbor] = neighbor_dist
+                    pred[neighbor] = this_node
+                    heappush(heap, (neighbor_dist, neighbor))
+                    stats['heap pushes'] += 1
+
+    def NewArray(self, default, typecode='l'):
+        return NodeMap(default)
+
+    def PathFromPred(self, pred, node):
+        """Return [node, pred[node], ...] back to the start of the chain."""
+        path = [node]
+        while pred[node] != self.no_pred:
+            node = pred[node]
+            path.append(node)
+        return path
+
+    def RemoveEdge(self, node, neighbor):
+        """Remove node->neighbor and repair the cached shortest-path tree."""
+        self.DeleteEdge(node, neighbor)
+        self.RepairEdge(node, neighbor)
+
+    def RepairEdge(self, node, neighbor):
+        """Repair the tree of the last GetSP after node->neighbor changed.
+
+        A cheaper edge re-runs Dijkstra from neighbor over the nodes it
+        improves.  A dearer or removed tree edge resets the subtree under
+        neighbor, seeds it from unaffected in-neighbors and settles only that
+        subtree again (Ramalingam-Reps style).  The child index and the
+        patched reverse graph keep the work proportional to the nodes whose
+        distance changes.
+        """
+        self.ResetStats(0)
+        res = self.shortest_distances
+        if not isinstance(res, SPResult) or node not in res:
+            return
+        dist, pred = res.dist, res.pred
+        cost = min([this_cost for this_neighbor, this_cost
+                    in self.Adjacencies(node) if this_neighbor == neighbor]
+                   or [self.infinite])
+        neighbor_dist = dist[node] + cost
+        children = self.GetChildren()
+        if neighbor_dist < dist[neighbor]:
+            dist[neighbor] = neighbor_dist
+            children[pred[neighbor]].discard(neighbor)
+            pred[neighbor] = node
+            children[node].add(neighbor)
+            self.heap = [(neighbor_dist, neighbor)]
+        elif pred[neighbor] == node and neighbor_dist > dist[neighbor]:
+            self.heap = self.ResetSubtree(dist, pred, neighbor)
+            heapq.heapify(self.heap)
+        else:
+            # The tree does not use this edge and it is no shorter.
+            return
+        self.stats['heap pushes'] = len(self.heap)
+        self.RepairSearch(dist, pred, children)
+
+    def RepairSearch(self, dist, pred, children):
+        """LazySearch that also moves nodes in the child index."""
+        stats = self.stats
+        heap = self.heap
+        adjacencies = self.Adjacencies
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap:
+            this_dist, this_node = heappop(heap)
+            if this_dist > dist[this_node]:
+                stats['stale pops'] += 1
                 continue
-            self.shortest_distances[this_node] = sp_info
-            for adj in self.graph[this_node]:
-                neighbor = adj.neighbor
-                if neighbor in self.shortest_distances:
+            stats['settled nodes'] += 1
+            for neighbor, cost in adjacencies(this_node):
+                neighbor_dist = this_dist + cost
+                if neighbor_dist < dist[neighbor]:
+                    dist[neighbor] = neighbor_dist
+                    children[pred[neighbor]].discard(neighbor)
+                    pred[neighbor] = this_node
+                    children[this_node].add(neighbor)
+                    heappush(heap, (neighbor_dist, neighbor))
+                    stats['heap pushes'] += 1
+
+    def ResetSubtree(self, dist, pred, root):
+        """Reset dist/pred under root and return heap entries to reseed it."""
+        children = self.GetChildren()
+        children[pred[root]].discard(root)
+        subtree = [root]
+        for node in subtree:
+            subtree.extend(children.pop(node, ()))
+        affected = set(subtree)
+        for node in subtree:
+            dist[node], pred[node] = self.infinite, self.no_pred
+        heap = []
+        for node in subtree:
+            for in_node, cost in self.ReverseAdjacencies(node):
+                if in_node in affected or dist[in_node] == self.infinite:
                     continue
-                neighbor_dist = sp_info.dist + adj.cost
-                if ((neighbor not in self.sp_info_map) or 
-                    (neighbor_dist < self.sp_info_map[neighbor].dist)):
-                    self.sp_info_map[neighbor] = SPInfo(
-                        neighbor, dist=neighbor_dist, pred=this_node)
-                    heapq.heappush(self.heap,
-                                   (neighbor_dist, self.sp_info_map[neighbor]))
-        return self.shortest_distances
+                if dist[in_node] + cost < dist[node]:
+                    dist[node], pred[node] = dist[in_node] + cost, in_node
+            if dist[node] != self.infinite:
+                children[pred[node]].add(node)
+                heap.append((dist[node], node))
+        return heap
+
+    def ReverseAdjacencies(self, node):
+        if self.reverse_graph is None:
+            self.reverse_graph = collections.defaultdict(list)
+            for this_node, adjs in self.graph.items():
+                for adj in adjs:
+                    self.reverse_graph[adj.neighbor].append(
+                        Adjacency(this_node, adj.cost))
+        return ((adj.neighbor, adj.cost) for adj in self.reverse_graph[node])
+
+    def ResetStats(self, heap_pushes):
+        self.stats = {'heap pushes': heap_pushes, 'stale pops': 0,
+                      'decrease keys': 0, 'settled nodes': 0}
+
+    def Search(self, source, target=None, reverse=False):
+        """Run Dijkstra from source and return the (dist, pred) state.
+
+        Stops once target is settled if given.  With reverse=True the search
+        follows edges backwards, so dist holds distances *to* source.
+        """
+        self.ResetStats(1)
+        adjacencies = self.ReverseAdjacencies if reverse else self.Adjacencies
+        dist = self.NewArray(self.infinite, self.dist_typecode)
+        pred = self.NewArray(self.no_pred)
+        dist[source] = 0
+        if self.indexed_heap:
+            self.heap = IndexedHeap(self.NewArray(-1))
+            self.heap.Push(0, source)
+            self.IndexedSearch(dist, pred, adjacencies, target=target)
+        else:
+            self.heap = [(0, source)]
+            self.LazySearch(dist, pred, adjacencies, target=target)
+        return dist, pred
+
+    def SetEdgeCost(self, node, neighbor, cost):
+        adjs = [adj for adj in self.graph[node] if adj.neighbor != neighbor]
+        adjs.append(Adjacency(neighbor, cost))
+        self.graph[node] = adjs
+        if neighbor not in self.graph:
+            self.graph[neighbor] = []
+        if self.reverse_graph is not None:
+            # Patch the in-edges of neighbor instead of rebuilding them all.
+            adjs = [adj for adj in self.reverse_graph[neighbor]
+                    if adj.neighbor != node]
+            adjs.append(Adjacency(node, cost))
+            self.reverse_graph[neighbor] = adjs
+
+    def UpdateEdge(self, node, neighbor, cost):
+        """Set the cost of node->neighbor, adding the edge if missing, and
+        repair the cached shortest-path tree of the last GetSP.
+        """
+        self.SetEdgeCost(node, neighbor, cost)
+        self.RepairEdge(node, neighbor)
+
+    @property
+    def dist_typecode(self):
+        return 'l'
+
+
+class CsrDijkstra(Dijkstra):
+    """Dijkstra over a CsrGraph using flat dist/pred arrays."""
+
+    def __init__(self, graph, indexed_heap=False):
+        super(CsrDijkstra, self).__init__(indexed_heap=indexed_heap)
+        if not isinstance(graph, CsrGraph):
+            raise Error('Invalid graph: {}'.format(graph))
+        self.graph = graph
+        self.no_pred = NO_PRED
+        if self.dist_typecode not in 'bBhHiIlL':
+            self.infinite = float('inf')
+        # (node, neighbor) pairs deleted by DeleteEdge.  CSR rows cannot
+        # shrink, so these edges are skipped when adjacencies are read.
+        self.removed_edges = set()
+
+    def AddAdjacency(self, node, neighbor=None, cost=None):
+        raise Error('CsrGraph is read-only.')
+
+    def Adjacencies(self, node):
+        adjs = self.graph.Adjacencies(node)
+        if not self.removed_edges:
+            return adjs
+        removed = self.removed_edges
+        return ((neighbor, cost) for neighbor, cost in adjs
+                if (node, neighbor) not in removed)
+
+    def DeleteEdge(self, node, neighbor):
+        if (node, neighbor) in self.removed_edges or not self.FindSlots(
+            node, neighbor):
+            raise Error('No edge: {}->{}'.format(node, neighbor))
+        self.removed_edges.add((node, neighbor))
+
+    def FindSlots(self, node, neighbor):
+        """Return the positions of the node->neighbor edges in the graph."""
+        graph = self.graph
+        if node not in graph:
+            raise Error('Invalid node: {}'.format(node))
+        return [i for i in xrange(graph.offsets[node], graph.offsets[node+1])
+                if graph.neighbors[i] == neighbor]
+
+    def NewArray(self, default, typecode='l'):
+        return array.array(typecode, [default]) * self.graph.num_nodes
+
+    def ReverseAdjacencies(self, node):
+        if self.reverse_graph is None:
+            self.reverse_graph = self.graph.Reverse()
+        adjs = self.reverse_graph.Adjacencies(node)
+        if not self.removed_edges:
+            return adjs
+        removed = self.removed_edges
+        return ((in_node, cost) for in_node, cost in adjs
+                if (in_node, node) not in removed)
+
+    def SetEdgeCost(self, node, neighbor, cost):
+        slots = self.FindSlots(node, neighbor)
+        if not slots:
+            raise Error('CsrGraph cannot add edge: {}->{}'.format(
+                node, neighbor))
+        for i in slots:
+            self.graph.costs[i] = cost
+        self.removed_edges.discard((node, neighbor))
+        reverse = self.reverse_graph
+        if reverse is not None:
+            # The reverse row of neighbor holds the same edges as in-edges.
+            for i in xrange(reverse.offsets[neighbor],
+                            reverse.offsets[neighbor+1]):
+                if reverse.neighbors[i] == node:
+                    reverse.costs[i] = cost
+
+    @property
+    def dist_typecode(self):
+        # Sums of narrow costs overflow their own typecode, and the
+        # unreachable marker is sys.maxint, so dist is a long or a double.
+        if self.graph.costs.typecode in 'bBhHiIlL':
+            return 'l'
+        return 'd'
+
+
+class EuclideanHeuristic(object):
+    """A* heuristic: straight-line distance between node coordinates.
+
+    coordinates maps node -> (x, y), e.g. test_tsp.TSP.city_map.  Edge costs
+    must be at least scale times the Euclidean length of the edge.
+    """
+
+    def __init__(self, coordinates, scale=1.0):
+        self.coordinates = coordinates
+        self.scale = scale
+
+    def __call__(self, node, target):
+        node_x, node_y = self.coordinates[node]
+        target_x, target_y = self.coordinates[target]
+        return self.scale * math.hypot(node_x - target_x, node_y - target_y)
+
+
+class LandmarkHeuristic(object):
+    """A* heuristic from precomputed landmark distances (ALT).
+
+    By the triangle inequality, d(node, target) is at least
+    d(landmark, target) - d(landmark, node) and
+    d(node, landmark) - d(target, landmark) for every landmark.
+    """
+
+    def __init__(self, dijkstra, landmarks=None, count=4, start=None):
+        self.dijkstra = dijkstra
+        if landmarks is None:
+            landmarks = self.SelectLandmarks(count, start)
+        self.landmarks = landmarks
+        self.dist_from, self.dist_to = [], []
+        for landmark in landmarks:
+            self.dist_from.append(dijkstra.Search(landmark)[0])
+            self.dist_to.append(dijkstra.Search(landmark, reverse=True)[0])
+
+    def __call__(self, node, target):
+        infinite = self.dijkstra.infinite
+        estimate = 0
+        for dist_from, dist_to in itertools.izip(self.dist_from, self.dist_to):
+            if dist_from[node] != infinite and dist_from[target] != infinite:
+                estimate = max(estimate, dist_from[target] - dist_from[node])
+            if dist_to[node] != infinite and dist_to[target] != infinite:
+                estimate = max(estimate, dist_to[node] - dist_to[target])
+        return estimate
+
+    def SelectLandmarks(self, count, start=None):
+        """Pick landmarks greedily, each farthest from those already picked.
+
+        Only nodes reachable from start are candidates.  Defaults to the
+        first node with an out-edge.
+        """
+        dijkstra = self.dijkstra
+        if start is None:
+            start = next(node for node in dijkstra.graph
+                         if any(True for _ in dijkstra.Adjacencies(node)))
+        landmarks, min_dist = [start], None
+        while len(landmarks) < count:
+            dist, pred = dijkstra.Search(landmarks[-1])
+            if min_dist is None:
+                min_dist = dict((node, dist[node]) for node in SPResult(
+                    dist, pred, dijkstra.infinite, dijkstra.no_pred))
+            else:
+                for node in min_dist:
+                    min_dist[node] = min(min_dist[node], dist[node])
+            candidates = [(node_dist, node)
+                          for node, node_dist in min_dist.iteritems()
+                          if node not in landmarks]
+            if not candidates:
+                break
+            landmarks.append(max(candidates)[1])
+        return landmarks
                     
                             
 class DijkstraTest(unittest2.TestCase):
@@ -177,6 +893,444 @@ class DijkstraTest(unittest2.TestCase):
         self.assertEqual(res[5], SPInfo(5, dist=20, pred=6))
         self.assertEqual(res[6], SPInfo(6, dist=11, pred=3))
 
+
+class GetPathTest(unittest2.TestCase):
+
+    def setUp(self):
+        self.dk = Dijkstra()
+        edges = [(1, 2, 7), (1, 3, 9), (1, 6, 14), (2, 1, 7), (2, 3, 10),
+                 (2, 4, 15), (3, 1, 9), (3, 2, 10), (3, 4, 11), (3, 6, 2),
+                 (4, 2, 15), (4, 3, 11), (4, 5, 6), (5, 4, 6), (5, 6, 9),
+                 (6, 1, 14), (6, 3, 2), (6, 5, 9), (7, 1, 1)]
+        for edge in edges:
+            self.dk.AddAdjacency(*edge)
+
+    def testInvalidNode(self):
+        with self.assertRaises(Error):
+            self.dk.GetPath(1, 8)
+
+    def testPath(self):
+        for bidirectional in (False, True):
+            self.assertEqual((20, [1, 3, 6, 5]), self.dk.GetPath(
+                1, 5, bidirectional=bidirectional))
+            self.assertEqual((0, [4]), self.dk.GetPath(
+                4, 4, bidirectional=bidirectional))
+            self.assertEqual((10, [7, 1, 3]), self.dk.GetPath(
+                7, 3, bidirectional=bidirectional))
+
+    def testUnreachable(self):
+        for bidirectional in (False, True):
+            self.assertEqual((INFINITE, []), self.dk.GetPath(
+                1, 7, bidirectional=bidirectional))
+
+    def testSinkTarget(self):
+        for bidirectional in (False, True):
+            dk = Dijkstra()
+            dk.AddAdjacency(1, 2, 5)
+            self.assertEqual((5, [1, 2]), dk.GetPath(
+                1, 2, bidirectional=bidirectional))
+        dk = Dijkstra()
+        dk.AddAdjacency(1, 2, 5)
+        self.assertEqual((5, [1, 2]), dk.GetPath(
+            1, 2, heuristic=lambda node, target: 0))
+
+    def testEarlyExit(self):
+        self.dk.GetPath(1, 2)
+        early_pushes = self.dk.stats['heap pushes']
+        self.dk.GetSP(1)
+        self.assertTrue(early_pushes < self.dk.stats['heap pushes'])
+
+    def testRandomGraph(self):
+        random.seed(1)
+        dk = Dijkstra()
+        for node in xrange(200):
+            dk.AddAdjacency(node)
+            for _ in xrange(3):
+                dk.AddAdjacency(node, random.randint(0, 199),
+                                random.randint(0, 100))
+        csr_dk = CsrDijkstra(CsrGraph.FromEdges(
+            (node, adj.neighbor, adj.cost)
+            for node, adjs in dk.graph.items() for adj in adjs))
+        for _ in xrange(20):
+            source, target = random.randint(0, 199), random.randint(0, 199)
+            res = dk.GetSP(source)
+            expect = res[target].dist if target in res else INFINITE
+            for graph in (dk, csr_dk):
+                for bidirectional in (False, True):
+                    dist, path = graph.GetPath(
+                        source, target, bidirectional=bidirectional)
+                    self.assertEqual(expect, dist)
+                    if dist == INFINITE:
+                        continue
+                    self.assertEqual([source, target], [path[0], path[-1]])
+                    self.assertEqual(dist, sum(
+                        min(adj.cost for adj in dk.graph[node]
+                            if adj.neighbor == neighbor)
+                        for node, neighbor in zip(path, path[1:])))
+
+
+class AStarTest(unittest2.TestCase):
+    SIZE = 30
+
+    def setUp(self):
+        # Grid with random costs no smaller than the Euclidean edge length.
+        random.seed(2)
+        self.coordinates = {}
+        edges = []
+        for x in xrange(self.SIZE):
+            for y in xrange(self.SIZE):
+                node = x * self.SIZE + y
+                self.coordinates[node] = (x, y)
+                for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+                    if 0 <= nx < self.SIZE and 0 <= ny < self.SIZE:
+                        edges.append((node, nx * self.SIZE + ny,
+                                      random.randint(1, 3)))
+        self.dk = Dijkstra()
+        for edge in edges:
+            self.dk.AddAdjacency(*edge)
+        self.csr_dk = CsrDijkstra(CsrGraph.FromEdges(edges))
+
+    def testBidirectionalHeuristic(self):
+        with self.assertRaises(Error):
+            self.dk.GetPath(0, 1, bidirectional=True,
+                            heuristic=EuclideanHeuristic(self.coordinates))
+
+    def testEuclidean(self):
+        heuristic = EuclideanHeuristic(self.coordinates)
+        source, target = 0, self.SIZE + 3
+        expect = self.dk.GetPath(source, target)
+        dijkstra_settled = self.dk.stats['settled nodes']
+        self.assertEqual(expect[0], self.dk.GetPath(
+            source, target, heuristic=heuristic)[0])
+        self.assertTrue(self.dk.stats['settled nodes'] < dijkstra_settled)
+
+    def testLandmark(self):
+        for dk in (self.dk, self.csr_dk):
+            heuristic = LandmarkHeuristic(dk, count=4)
+            self.assertEqual(4, len(set(heuristic.landmarks)))
+            total_settled = [0, 0]
+            for _ in xrange(20):
+                source = random.randint(0, self.SIZE ** 2 - 1)
+                target = random.randint(0, self.SIZE ** 2 - 1)
+                dist, _ = dk.GetPath(source, target)
+                total_settled[0] += dk.stats['settled nodes']
+                self.assertEqual(dist, dk.GetPath(
+                    source, target, heuristic=heuristic)[0])
+                total_settled[1] += dk.stats['settled nodes']
+            self.assertTrue(total_settled[1] * 2 < total_settled[0])
+
+    def testTSPCities(self):
+        import test_tsp
+        tsp = test_tsp.TSP()
+        with open('tsp.txt', 'r') as fd:
+            total_cities = int(fd.readline())
+            for city in range(1, total_cities+1):
+                x, y = [float(e) for e in fd.readline().split()]
+                tsp.Add(city, x, y)
+        dk = Dijkstra()
+        for city1 in tsp.city_map:
+            # Connect each city to its 4 nearest neighbors.
+            nearest = sorted((tsp.Distance(city1, city2), city2)
+                             for city2 in tsp.city_map if city2 != city1)
+            for cost, city2 in nearest[:4]:
+                dk.AddAdjacency(city1, city2, cost)
+                dk.AddAdjacency(city2, city1, cost)
+        heuristic = EuclideanHeuristic(tsp.city_map)
+        dist, path = dk.GetPath(1, 25)
+        self.assertEqual((dist, path), dk.GetPath(1, 25, heuristic=heuristic))
+
+
+class IndexedHeapTest(unittest2.TestCase):
+
+    def testPopEmpty(self):
+        with self.assertRaises(Error):
+            IndexedHeap().Pop()
+
+    def testPushTwice(self):
+        heap = IndexedHeap()
+        heap.Push(1, 'a')
+        with self.assertRaises(Error):
+            heap.Push(2, 'a')
+
+    def testIncreaseKey(self):
+        heap = IndexedHeap()
+        heap.Push(1, 'a')
+        with self.assertRaises(Error):
+            heap.DecreaseKey(2, 'a')
+
+    def testDecreaseKey(self):
+        heap = IndexedHeap()
+        for key, item in [(5, 'a'), (3, 'b'), (4, 'c'), (9, 'd')]:
+            heap.Push(key, item)
+        heap.DecreaseKey(1, 'd')
+        heap.DecreaseKey(2, 'a')
+        self.assertEqual([(1, 'd'), (2, 'a'), (3, 'b'), (4, 'c')],
+                         [heap.Pop() for _ in xrange(4)])
+        self.assertEqual(0, len(heap))
+        self.assertNotIn('a', heap)
+
+    def testRandom(self):
+        rng = random.Random(1)
+        heap = IndexedHeap(array.array('l', [-1]) * 100)
+        keys = {}
+        for _ in xrange(1000):
+            item = rng.randint(0, 99)
+            key = rng.randint(0, 1000)
+            if item not in heap:
+                heap.Push(key, item)
+                keys[item] = key
+            elif key < keys[item]:
+                heap.DecreaseKey(key, item)
+                keys[item] = key
+        popped = [heap.Pop() for _ in xrange(len(heap))]
+        self.assertEqual(sorted(keys.values()), [key for key, _ in popped])
+        self.assertEqual(keys, dict((item, key) for key, item in popped))
+
+
+class HeapStatsTest(unittest2.TestCase):
+
+    def GetGraph(self, indexed_heap):
+        dk = Dijkstra(indexed_heap=indexed_heap)
+        for node in xrange(20):
+            for neighbor in xrange(20):
+                if node != neighbor:
+                    dk.AddAdjacency(node, neighbor, abs(node - neighbor) ** 2)
+        return dk
+
+    def testLazyStats(self):
+        dk = self.GetGraph(False)
+        res = dk.GetSP(0)
+        self.assertEqual(res[19], SPInfo(19, dist=19, pred=18))
+        self.assertEqual(dk.stats['heap pushes'] - dk.stats['stale pops'], 20)
+        self.assertEqual(0, dk.stats['decrease keys'])
+
+    def testIndexedStats(self):
+        dk = self.GetGraph(True)
+        res = dk.GetSP(0)
+        self.assertEqual(res[19], SPInfo(19, dist=19, pred=18))
+        self.assertEqual(20, dk.stats['heap pushes'])
+        self.assertEqual(0, dk.stats['stale pops'])
+        self.assertTrue(dk.stats['decrease keys'] > 0)
+
+    def testSameResult(self):
+        lazy, indexed = self.GetGraph(False), self.GetGraph(True)
+        for node in (0, 7, 19):
+            lazy_res, indexed_res = lazy.GetSP(node), indexed.GetSP(node)
+            self.assertEqual(sorted(lazy_res), sorted(indexed_res))
+            for dest in lazy_res:
+                self.assertEqual(lazy_res[dest].dist, indexed_res[dest].dist)
+
+
+class CsrGraphTest(unittest2.TestCase):
+
+    def testInvalidOffsets(self):
+        with self.assertRaises(Error):
+            CsrGraph(2, array.array('l', [0]), array.array('l'),
+                     array.array('l'))
+
+    def testFromEdges(self):
+        graph = CsrGraph.FromEdges([(2, 0, 5), (0, 1, 1), (2, 1, 3)])
+        self.assertEqual(3, len(graph))
+        self.assertEqual([0, 1, 1, 3], list(graph.offsets))
+        self.assertEqual([(1, 1)], list(graph.Adjacencies(0)))
+        self.assertEqual([], list(graph.Adjacencies(1)))
+        self.assertEqual([(0, 5), (1, 3)], list(graph.Adjacencies(2)))
+        self.assertIn(2, graph)
+        self.assertNotIn(3, graph)
+
+    @unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+    def testFromNumpyArrays(self):
+        graph = CsrGraph.FromArrays(numpy.array([2, 0, 2]),
+                                    numpy.array([0, 1, 1]),
+                                    numpy.array([5, 1, 3]))
+        self.assertEqual(3, len(graph))
+        self.assertEqual([(0, 5), (1, 3)], list(graph.Adjacencies(2)))
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        self.assertEqual(0, len(CsrGraph.FromArrays(empty, empty, empty)))
+
+    def testFromFile(self):
+        graph = CsrGraph.FromFile('dijkstraData.txt')
+        self.assertEqual(201, len(graph))
+        self.assertEqual((80, 982), next(graph.Adjacencies(1)))
+
+
+class CsrDijkstraTest(unittest2.TestCase):
+
+    def testInvalidGraph(self):
+        with self.assertRaises(Error):
+            CsrDijkstra(None)
+
+    def testGetSPInvalidNode(self):
+        with self.assertRaises(Error):
+            CsrDijkstra(CsrGraph.FromEdges([(0, 1, 1)])).GetSP(2)
+
+    def testSP3(self):
+        edges = [(1, 2, 7), (1, 3, 9), (1, 6, 14), (2, 1, 7), (2, 3, 10),
+                 (2, 4, 15), (3, 1, 9), (3, 2, 10), (3, 4, 11), (3, 6, 2),
+                 (4, 2, 15), (4, 3, 11), (4, 5, 6), (5, 4, 6), (5, 6, 9),
+                 (6, 1, 14), (6, 3, 2), (6, 5, 9)]
+        res = CsrDijkstra(CsrGraph.FromEdges(edges)).GetSP(1)
+        self.assertEqual([1, 2, 3, 4, 5, 6], list(res))
+        self.assertEqual(res[1], SPInfo(1, dist=0))
+        self.assertEqual(res[2], SPInfo(2, dist=7, pred=1))
+        self.assertEqual(res[3], SPInfo(3, dist=9, pred=1))
+        self.assertEqual(res[4], SPInfo(4, dist=20, pred=3))
+        self.assertEqual(res[5], SPInfo(5, dist=20, pred=6))
+        self.assertEqual(res[6], SPInfo(6, dist=11, pred=3))
+        self.assertNotIn(0, res)
+
+    def testIndexedHeap(self):
+        graph = CsrGraph.FromEdges(
+            [(0, 1, 4), (0, 2, 1), (2, 1, 2), (1, 3, 1), (2, 3, 5)])
+        dk = CsrDijkstra(graph, indexed_heap=True)
+        res = dk.GetSP(0)
+        self.assertEqual(res[3], SPInfo(3, dist=4, pred=1))
+        self.assertEqual(2, dk.stats['decrease keys'])
+
+    def testFloatCosts(self):
+        graph = CsrGraph.FromEdges([(0, 1, 0.5), (1, 2, 0.25)], num_nodes=4,
+                                   typecode='d')
+        res = CsrDijkstra(graph).GetSP(0)
+        self.assertEqual(res[2], SPInfo(2, dist=0.75, pred=1))
+        self.assertNotIn(3, res)
+
+    def testNarrowCosts(self):
+        for typecode in ('b', 'i'):
+            graph = CsrGraph.FromEdges([(0, 1, 100), (1, 2, 100)],
+                                       num_nodes=4, typecode=typecode)
+            res = CsrDijkstra(graph).GetSP(0)
+            self.assertEqual(res[2], SPInfo(2, dist=200, pred=1))
+            self.assertNotIn(3, res)
+
+
+class UpdateEdgeTest(unittest2.TestCase):
+
+    def setUp(self):
+        self.dk = Dijkstra()
+        for edge in [(0, 1, 4), (0, 2, 1), (2, 1, 2), (1, 3, 1), (2, 3, 5),
+                     (3, 4, 3)]:
+            self.dk.AddAdjacency(*edge)
+
+    def testNoCachedTree(self):
+        self.dk.UpdateEdge(0, 1, 1)
+        self.assertEqual({}, self.dk.shortest_distances)
+
+    def testDecrease(self):
+        self.dk.GetSP(0)
+        self.dk.UpdateEdge(0, 3, 1)
+        res = self.dk.shortest_distances
+        self.assertEqual(res[3], SPInfo(3, dist=1, pred=0))
+        self.assertEqual(res[4], SPInfo(4, dist=4, pred=3))
+        self.assertEqual(2, self.dk.stats['settled nodes'])
+
+    def testIncrease(self):
+        self.dk.GetSP(0)
+        self.dk.UpdateEdge(2, 1, 10)
+        res = self.dk.shortest_distances
+        self.assertEqual(res[1], SPInfo(1, dist=4, pred=0))
+        self.assertEqual(res[3], SPInfo(3, dist=5, pred=1))
+        self.assertEqual(res[4], SPInfo(4, dist=8, pred=3))
+        self.assertEqual(res[2], SPInfo(2, dist=1, pred=0))
+
+    def testNonTreeEdge(self):
+        self.dk.GetSP(0)
+        self.dk.UpdateEdge(2, 3, 100)
+        self.assertEqual(0, self.dk.stats['settled nodes'])
+        self.assertEqual(self.dk.shortest_distances[3].dist, 4)
+
+    def testRemove(self):
+        self.dk.GetSP(0)
+        self.dk.RemoveEdge(3, 4)
+        self.assertNotIn(4, self.dk.shortest_distances)
+        with self.assertRaises(Error):
+            self.dk.RemoveEdge(3, 4)
+
+    def testCsrRemoveNarrowCost(self):
+        dk = CsrDijkstra(CsrGraph.FromEdges(
+            [(0, 1, 4), (0, 2, 1), (2, 1, 2), (1, 3, 1), (2, 3, 5),
+             (3, 4, 3)], typecode='i'))
+        dk.GetSP(0)
+        dk.RemoveEdge(2, 1)
+        res = dk.shortest_distances
+        self.assertEqual(res[1], SPInfo(1, dist=4, pred=0))
+        self.assertEqual(res[3], SPInfo(3, dist=5, pred=1))
+        self.assertEqual([(3, 1)], list(dk.Adjacencies(1)))
+        self.assertEqual([(0, 4)], list(dk.ReverseAdjacencies(1)))
+        with self.assertRaises(Error):
+            dk.RemoveEdge(2, 1)
+        dk.UpdateEdge(2, 1, 1)
+        self.assertEqual(res[1], SPInfo(1, dist=2, pred=2))
+
+    def testCsrAddEdge(self):
+        dk = CsrDijkstra(CsrGraph.FromEdges([(0, 1, 1)], num_nodes=3))
+        with self.assertRaises(Error):
+            dk.UpdateEdge(0, 2, 1)
+
+    def testReverseGraphPatched(self):
+        csr_dk = CsrDijkstra(CsrGraph.FromEdges(
+            [(0, 1, 4), (0, 2, 1), (2, 1, 2), (1, 3, 1), (2, 3, 5),
+             (3, 4, 3)]))
+        for dk in (self.dk, csr_dk):
+            dk.GetSP(0)
+            dk.UpdateEdge(2, 1, 10)
+            reverse = dk.reverse_graph
+            self.assertIsNotNone(reverse)
+            dk.UpdateEdge(1, 3, 7)
+            dk.RemoveEdge(0, 2)
+            self.assertIs(reverse, dk.reverse_graph)
+            self.assertIn((1, 7), list(dk.ReverseAdjacencies(3)))
+            self.assertNotIn((0, 1), list(dk.ReverseAdjacencies(2)))
+            self.assertNotIn(2, dk.shortest_distances)
+            self.assertEqual(dk.shortest_distances[3],
+                             SPInfo(3, dist=11, pred=1))
+
+    def testRandomGraph(self):
+        random.seed(2)
+        edges = {}
+        for node in xrange(100):
+            for _ in xrange(3):
+                edges[node, random.randint(0, 99)] = random.randint(0, 100)
+        dk = Dijkstra()
+        for (node, neighbor), cost in edges.items():
+            dk.AddAdjacency(node, neighbor, cost)
+        csr_dk = CsrDijkstra(CsrGraph.FromEdges(
+            (node, neighbor, cost) for (node, neighbor), cost in edges.items()))
+        dk.GetSP(0)
+        csr_dk.GetSP(0)
+        for _ in xrange(200):
+            node, neighbor = random.choice(edges.keys())
+            if random.random() < 0.2:
+                dk.RemoveEdge(node, neighbor)
+                csr_dk.RemoveEdge(node, neighbor)
+                del edges[node, neighbor]
+            else:
+                edges[node, neighbor] = random.randint(0, 100)
+                dk.UpdateEdge(node, neighbor, edges[node, neighbor])
+                csr_dk.UpdateEdge(node, neighbor, edges[node, neighbor])
+            expect = Dijkstra()
+            expect.AddAdjacency(0)
+            for (this_node, this_neighbor), cost in edges.items():
+                expect.AddAdjacency(this_node, this_neighbor, cost)
+            expect_res = expect.GetSP(0)
+            expect_dist = dict((node, expect_res[node].dist)
+                               for node in expect_res)
+            for graph in (dk, csr_dk):
+                res = graph.shortest_distances
+                self.assertEqual(expect_dist, dict(
+                    (node, res[node].dist) for node in res))
+                children = collections.defaultdict(set)
+                for node in res:
+                    pred = res[node].pred
+                    if pred is not None:
+                        self.assertEqual(res[node].dist,
+                                         res[pred].dist + edges[pred, node])
+                        children[pred].add(node)
+                if graph.children is not None:
+                    self.assertEqual(children, dict(
+                        (node, nodes) for node, nodes
+                        in graph.children.items() if nodes))
+
+
 class HWTest(unittest2.TestCase):
     INFINITE = 1000000
 
@@ -197,6 +1351,13 @@ class HWTest(unittest2.TestCase):
         dist_list = [str(res[node].dist if node in res else self.INFINITE)
                      for node in node_list]
         print 'Answer: {}'.format(','.join(dist_list))
+
+    def testCsrHW(self):
+        res = CsrDijkstra(CsrGraph.FromFile('dijkstraData.txt')).GetSP(1)
+        expect = self.dk.GetSP(1)
+        self.assertEqual(sorted(expect), list(res))
+        for node in expect:
+            self.assertEqual(expect[node].dist, res[node].dist)
             
 
 if __name__ == '__main__':
@@ -1,12 +1,21 @@
 #!/usr/bin/python
 
 
+import array
 import collections
 import copy
+import math
+import multiprocessing
 import random
+import test_cluster
 import unittest2
 
 
+# Per-process state of the parallel Karger workers.  It is set once by
+# InitKargerWorker so that tasks only carry their trial index and seed.
+WORKER_STATE = {}
+
+
 class Error(Exception):
     """Base error class."""
 
@@ -90,6 +99,307 @@ class MinCutGraph(object):
         return min_cut
 
 
+def KargerCut(sources, dests, num_nodes, rng):
+    """Return the ids of the edges cut by one random contraction."""
+    uf = test_cluster.ArrayUnionFind(num_nodes)
+    uf.Add(xrange(num_nodes))
+    order = range(len(sources))
+    rng.shuffle(order)
+    for i in order:
+        if uf.components <= 2:
+            break
+        uf.Union(sources[i], dests[i])
+    return [i for i in xrange(len(sources))
+            if uf.Find(sources[i]) != uf.Find(dests[i])]
+
+
+def InitKargerWorker(sources, dests, num_nodes, lower_bound, stop_trial):
+    """Pool initializer: keep the edge arrays and shared stop index."""
+    WORKER_STATE['graph'] = (sources, dests, num_nodes)
+    WORKER_STATE['lower_bound'] = lower_bound
+    WORKER_STATE['stop_trial'] = stop_trial
+
+
+def RunKargerTrial(task):
+    """Return (trial, cut edge ids), or (trial, None) if it was skipped.
+
+    A trial whose cut reaches the lower bound lowers the shared stop index
+    to its own index, and trials after the stop index are skipped.
+    """
+    trial, seed = task
+    stop_trial = WORKER_STATE['stop_trial']
+    if trial > stop_trial.value:
+        return trial, None
+    cut = KargerCut(*WORKER_STATE['graph'], rng=random.Random(seed))
+    if len(cut) <= WORKER_STATE['lower_bound']:
+        with stop_trial.get_lock():
+            stop_trial.value = min(stop_trial.value, trial)
+    return trial, cut
+
+
+class ArrayMinCut(MinCutGraph):
+    """Karger on integer edge arrays: contract edges of a random permutation
+    with ArrayUnionFind until two components are left.
+
+    Skipping edges inside a component is the same as picking a random edge
+    of the contracted multigraph, so no graph copy is ever made.
+    """
+
+    def __init__(self):
+        super(ArrayMinCut, self).__init__()
+        self.node_list = []
+        self.edge_list = []
+        self.sources = array.array('l')
+        self.dests = array.array('l')
+
+    def AddEdge(self, node, adjacencies):
+        super(ArrayMinCut, self).AddEdge(node, adjacencies)
+        # Rebuild the edge arrays on the next cut.
+        self.edge_list = []
+
+    def IsConnected(self):
+        self.InitEdgeArrays()
+        uf = test_cluster.ArrayUnionFind(len(self.node_list))
+        uf.Add(xrange(len(self.node_list)))
+        uf.UnionMany(self.sources, self.dests)
+        return uf.components == 1
+
+    def InitEdgeArrays(self):
+        if self.edge_list:
+            return
+        nodes = set(self.graph)
+        for edge in self.all_edges:
+            nodes.update(edge.split('-'))
+        self.node_list = sorted(nodes)
+        node_ids = dict((node, i) for i, node in enumerate(self.node_list))
+        self.edge_list = sorted(self.all_edges)
+        self.sources = array.array('l')
+        self.dests = array.array('l')
+        for edge in self.edge_list:
+            node1, node2 = edge.split('-')
+            self.sources.append(node_ids[node1])
+            self.dests.append(node_ids[node2])
+
+    def ParallelMinCut(self, trials=100, seed=0, processes=None,
+                       lower_bound=None):
+        """Run Karger trials in a process pool; reproducible for a seed.
+
+        Trial i always uses the i-th seed drawn from random.Random(seed).
+        The result is the smallest cut of trials 0..stop, ties going to
+        the lower trial, where stop is the first trial whose cut reaches
+        lower_bound (1 for a connected graph by default).  Later trials are
+        skipped or ignored, so the answer does not depend on scheduling.
+        """
+        self.InitEdgeArrays()
+        if lower_bound is None:
+            lower_bound = 1 if self.IsConnected() else 0
+        master = random.Random(seed)
+        tasks = [(trial, master.getrandbits(64)) for trial in xrange(trials)]
+        stop_trial = multiprocessing.Value('l', trials)
+        pool = multiprocessing.Pool(
+            processes, initializer=InitKargerWorker,
+            initargs=(self.sources, self.dests, len(self.node_list),
+                      lower_bound, stop_trial))
+        try:
+            results = dict(pool.imap_unordered(RunKargerTrial, tasks))
+        finally:
+            pool.close()
+            pool.join()
+        self.stop_trial = min(stop_trial.value, trials - 1)
+        cuts = [results[trial] for trial in xrange(self.stop_trial + 1)]
+        return set(self.edge_list[i] for i in min(cuts, key=len))
+
+    def RandomCut(self, rng=random):
+        self.InitEdgeArrays()
+        return set(self.edge_list[i] for i in KargerCut(
+            self.sources, self.dests, len(self.node_list), rng))
+
+
+class KargerStein(ArrayMinCut):
+    """Karger-Stein recursive contraction.
+
+    A run contracts to 1 + n/sqrt(2) nodes twice independently, recurses on
+    both and keeps the smaller cut, which finds a min cut with probability
+    Omega(1/log n).  Parallel edges are merged into weights, so a graph of
+    n nodes never has more than n**2 / 2 edges.  A graph is (sources,
+    dests, weights, number of nodes) and a cut is (weight, side), where
+    side[node] tells which half node is in.
+    """
+
+    def Contract(self, graph, target, rng):
+        """Contract graph to target nodes; return it and the node mapping.
+
+        Contracting the edges in order of exponential(weight) keys is the
+        same as picking each next edge with probability proportional to
+        its weight.
+        """
+        sources, dests, weights, num_nodes = graph
+        keys = [rng.expovariate(weight) for weight in weights]
+        uf = test_cluster.ArrayUnionFind(num_nodes)
+        uf.Add(xrange(num_nodes))
+        for i in sorted(xrange(len(keys)), key=keys.__getitem__):
+            if uf.components <= target:
+                break
+            uf.Union(sources[i], dests[i])
+        # Renumber the components 0..k-1 and merge the edges between them.
+        comp_ids = array.array('l', [-1]) * num_nodes
+        num_comps = 0
+        for node in xrange(num_nodes):
+            leader = uf.Find(node)
+            if comp_ids[leader] < 0:
+                comp_ids[leader] = num_comps
+                num_comps += 1
+            comp_ids[node] = comp_ids[leader]
+        comp_weights = collections.defaultdict(int)
+        for i in xrange(len(weights)):
+            comp1, comp2 = comp_ids[sources[i]], comp_ids[dests[i]]
+            if comp1 < comp2:
+                comp_weights[comp1, comp2] += weights[i]
+            elif comp2 < comp1:
+                comp_weights[comp2, comp1] += weights[i]
+        new_sources, new_dests, new_weights = (
+            array.array('l'), array.array('l'), array.array('l'))
+        for (comp1, comp2), weight in comp_weights.iteritems():
+            new_sources.append(comp1)
+            new_dests.append(comp2)
+            new_weights.append(weight)
+        return (new_sources, new_dests, new_weights, num_comps), comp_ids
+
+    def GetSmallCut(self, graph):
+        """Return the exact min cut of a graph of a few nodes."""
+        sources, dests, weights, num_nodes = graph
+        min_cut = None
+        # Keep the last node on side 0 so each cut is tried once.
+        for mask in xrange(1, 1 << (num_nodes - 1)):
+            weight = sum(weights[i] for i in xrange(len(weights))
+                         if (mask >> sources[i] ^ mask >> dests[i]) & 1)
+            if min_cut is None or weight < min_cut[0]:
+                min_cut = (weight, mask)
+        weight, mask = min_cut
+        return weight, bytearray((mask >> node) & 1
+                                 for node in xrange(num_nodes))
+
+    def GetTrials(self, failure_probability):
+        """Return the runs needed to miss the min cut with that probability.
+
+        With success probability p >= 1/log2(n) per run, (1 - p)**t <= delta
+        holds for t = ln(1/delta) * log2(n).
+        """
+        if not 0 < failure_probability < 1:
+            raise Error('Invalid failure_probability: {}'.format(
+                failure_probability))
+        self.InitEdgeArrays()
+        log_nodes = max(math.log(max(len(self.node_list), 2), 2), 1)
+        return int(math.ceil(math.log(1 / failure_probability) * log_nodes))
+
+    def KargerSteinMinCut(self, failure_probability=0.01, rng=random):
+        trials = self.GetTrials(failure_probability)
+        num_nodes = len(self.node_list)
+        if num_nodes < 2:
+            raise Error('Need at least 2 nodes: {}'.format(num_nodes))
+        if not self.IsConnected():
+            # Contract could never get below the number of components.
+            return set()
+        graph = (self.sources, self.dests,
+                 array.array('l', [1]) * len(self.edge_list), num_nodes)
+        min_cut = None
+        for _ in xrange(trials):
+            cut = self.RecursiveCut(graph, rng)
+            if min_cut is None or cut[0] < min_cut[0]:
+                min_cut = cut
+        side = min_cut[1]
+        return set(self.edge_list[i] for i in xrange(len(self.edge_list))
+                   if side[self.sources[i]] != side[self.dests[i]])
+
+    def RecursiveCut(self, graph, rng):
+        num_nodes = graph[3]
+        if num_nodes <= 6:
+            return self.GetSmallCut(graph)
+        target = int(math.ceil(1 + num_nodes / math.sqrt(2)))
+        min_cut = None
+        for _ in xrange(2):
+            sub_graph, comp_ids = self.Contract(graph, target, rng)
+            weight, sub_side = self.RecursiveCut(sub_graph, rng)
+            if min_cut is None or weight < min_cut[0]:
+                min_cut = (weight, bytearray(sub_side[comp_ids[node]]
+                                             for node in xrange(num_nodes)))
+        return min_cut
+
+
+class StoerWagner(MinCutGraph):
+    """Deterministic Stoer-Wagner min cut on an adjacency weight matrix.
+
+    AddEdge edges weigh 1 each, as in MinCutGraph, and AddWeightedEdge adds
+    weight on top, so parallel edges are just larger weights.
+    """
+
+    def __init__(self):
+        super(StoerWagner, self).__init__()
+        self.extra_weights = collections.defaultdict(int)
+
+    def AddWeightedEdge(self, node1, node2, weight=1):
+        if weight < 0:
+            raise Error('Invalid weight: {}'.format(weight))
+        for node in (node1, node2):
+            if node not in self.graph:
+                self.graph[node] = {'nodes': set([node]), 'edges': set()}
+        self.extra_weights[self.MakeEdge(node1, node2)] += weight
+
+    def GetWeightMatrix(self):
+        nodes = set(self.graph)
+        for edge in self.all_edges:
+            nodes.update(edge.split('-'))
+        node_list = sorted(nodes)
+        node_ids = dict((node, i) for i, node in enumerate(node_list))
+        weights = [array.array('l', [0]) * len(node_list) for _ in node_list]
+        for edges, get_weight in ((self.all_edges, lambda edge: 1),
+                                  (self.extra_weights,
+                                   self.extra_weights.__getitem__)):
+            for edge in edges:
+                node1, node2 = [node_ids[node] for node in edge.split('-')]
+                if node1 != node2:
+                    weights[node1][node2] += get_weight(edge)
+                    weights[node2][node1] += get_weight(edge)
+        return node_list, weights
+
+    def MinCut(self):
+        """Return (cut weight, (side1, side2)) with sides as sets of nodes.
+
+        Each phase grows a set by always adding the most tightly connected
+        node.  The last two nodes s and t give the min s-t cut of the phase;
+        then t is merged into s.  The best phase cut is the min cut.
+        """
+        node_list, weights = self.GetWeightMatrix()
+        num_nodes = len(node_list)
+        if num_nodes < 2:
+            raise Error('Need at least 2 nodes: {}'.format(num_nodes))
+        groups = [[node] for node in xrange(num_nodes)]
+        active = range(num_nodes)
+        min_cut = None
+        while len(active) > 1:
+            connectivity = dict((node, 0) for node in active)
+            prev_node = node = None
+            while connectivity:
+                prev_node = node
+                node = max(connectivity, key=connectivity.__getitem__)
+                phase_cut = connectivity.pop(node)
+                row = weights[node]
+                for other in connectivity:
+                    connectivity[other] += row[other]
+            if min_cut is None or phase_cut < min_cut[0]:
+                min_cut = (phase_cut, list(groups[node]))
+            # Merge node into prev_node.
+            groups[prev_node].extend(groups[node])
+            prev_row, row = weights[prev_node], weights[node]
+            active.remove(node)
+            for other in active:
+                prev_row[other] += row[other]
+                weights[other][prev_node] = prev_row[other]
+        weight, side = min_cut
+        side = set(node_list[node] for node in side)
+        return weight, (side, set(node_list) - side)
+
+
 class TestGraph(unittest2.TestCase):
 
     def testInvalidAdjacencies(self):
@@ -140,6 +450,267 @@ class TestGraph(unittest2.TestCase):
         self.assertEqual(len(graph.merged_graph), 1)
 
 
+class TestArrayMinCut(unittest2.TestCase):
+
+    def testRandomCut(self):
+        graph = ArrayMinCut()
+        graph.AddEdge('0', ['1', '3'])
+        graph.AddEdge('1', ['0', '2', '3'])
+        graph.AddEdge('2', ['1', '3'])
+        graph.AddEdge('3', ['0', '1', '2'])
+        cut = graph.RandomCut()
+        self.assertTrue(cut <= graph.all_edges)
+        self.assertTrue(2 <= len(cut) <= 3)
+
+    def testAddEdgeAfterCut(self):
+        graph = ArrayMinCut()
+        graph.AddEdge('0', ['1'])
+        self.assertEqual(set(['0-1']), graph.RandomCut())
+        graph.AddEdge('1', ['2'])
+        self.assertEqual(1, len(graph.RandomCut()))
+
+    def testRandomMinCut1(self):
+        graph = ArrayMinCut()
+        graph.AddEdge('0', ['1', '3'])
+        graph.AddEdge('1', ['0', '2', '3'])
+        graph.AddEdge('2', ['1', '3'])
+        graph.AddEdge('3', ['0', '1', '2'])
+        min_cut = graph.RandomMinCut()
+        self.assertEqual(len(min_cut), 2)
+
+    def testRandomMinCut2(self):
+        graph = ArrayMinCut()
+        graph.AddEdge('0', ['1'])
+        graph.AddEdge('1', ['0', '2', '3'])
+        graph.AddEdge('2', ['1', '4'])
+        graph.AddEdge('3', ['1', '4', '5'])
+        graph.AddEdge('4', ['2', '3', '5'])
+        graph.AddEdge('5', ['3', '4'])
+        min_cut = graph.RandomMinCut()
+        self.assertEqual(min_cut, set(['0-1']))
+
+    def testRandomMinCut3(self):
+        graph = ArrayMinCut()
+        graph.AddEdge('0', ['1', '2'])
+        graph.AddEdge('1', ['0', '2', '3'])
+        graph.AddEdge('2', ['0', '1', '4'])
+        graph.AddEdge('3', ['1', '4', '5'])
+        graph.AddEdge('4', ['2', '3', '5'])
+        graph.AddEdge('5', ['3', '4'])
+        min_cut = graph.RandomMinCut()
+        self.assertEqual(len(min_cut), 2)
+
+
+class TestParallelMinCut(unittest2.TestCase):
+
+    def GetGraph(self):
+        graph = ArrayMinCut()
+        graph.AddEdge('0', ['1', '2'])
+        graph.AddEdge('1', ['0', '2', '3'])
+        graph.AddEdge('2', ['0', '1', '4'])
+        graph.AddEdge('3', ['1', '4', '5'])
+        graph.AddEdge('4', ['2', '3', '5'])
+        graph.AddEdge('5', ['3', '4'])
+        return graph
+
+    def testIsConnected(self):
+        graph = self.GetGraph()
+        self.assertTrue(graph.IsConnected())
+        graph.AddEdge('6', ['7'])
+        self.assertFalse(graph.IsConnected())
+        self.assertEqual(set(), graph.ParallelMinCut(trials=5, processes=2))
+        self.assertEqual(0, graph.stop_trial)
+
+    def testEarlyStop(self):
+        graph = self.GetGraph()
+        min_cut = graph.ParallelMinCut(trials=50, processes=2, lower_bound=2)
+        self.assertEqual(2, len(min_cut))
+        # Cuts of size 2 are common, so trial 49 is never needed.
+        self.assertLess(graph.stop_trial, 49)
+
+    def testReproducible(self):
+        graph = ArrayMinCut()
+        with open('kargerMinCut.txt', 'r') as fd:
+            for line in fd:
+                node_list = line.split()
+                graph.AddEdge(node_list[0], node_list[1:])
+        min_cuts = [graph.ParallelMinCut(trials=40, seed=7,
+                                         processes=processes)
+                    for processes in (1, 3)]
+        self.assertEqual(min_cuts[0], min_cuts[1])
+        self.assertEqual(39, graph.stop_trial)
+
+    def testHomework(self):
+        graph = ArrayMinCut()
+        with open('kargerMinCut.txt', 'r') as fd:
+            for line in fd:
+                node_list = line.split()
+                graph.AddEdge(node_list[0], node_list[1:])
+        min_cut = graph.ParallelMinCut(trials=2000, lower_bound=17)
+        self.assertEqual(17, len(min_cut))
+        self.assertLess(graph.stop_trial, 1999)
+
+
+class TestKargerStein(unittest2.TestCase):
+
+    def GetBruteForceMinCut(self, edges):
+        nodes = sorted(set(node for edge in edges for node in edge))
+        min_cut = None
+        for mask in xrange(1, 1 << (len(nodes) - 1)):
+            side = set(node for i, node in enumerate(nodes) if mask >> i & 1)
+            cut = sum(1 for node1, node2 in edges
+                      if (node1 in side) != (node2 in side))
+            if min_cut is None or cut < min_cut:
+                min_cut = cut
+        return min_cut
+
+    def testInvalidFailureProbability(self):
+        graph = KargerStein()
+        graph.AddEdge('0', ['1'])
+        self.assertRaises(Error, graph.KargerSteinMinCut, 0)
+        self.assertRaises(Error, graph.KargerSteinMinCut, 1)
+
+    def testTooFewNodes(self):
+        self.assertRaises(Error, KargerStein().KargerSteinMinCut)
+
+    def testDisconnected(self):
+        graph = KargerStein()
+        for node in xrange(0, 14, 2):
+            graph.AddEdge(str(node), [str(node + 1)])
+        self.assertEqual(set(), graph.KargerSteinMinCut())
+
+    def testTrials(self):
+        graph = KargerStein()
+        for node in xrange(1, 257):
+            graph.AddEdge(str(node), [str(node - 1)])
+        # ln(100) * log2(257) = 4.6 * 8.006
+        self.assertEqual(37, graph.GetTrials(0.01))
+        self.assertLess(graph.GetTrials(0.1), graph.GetTrials(0.01))
+
+    def testContractWeights(self):
+        graph = KargerStein()
+        # Edges 0-1 (3), 1-2 (1), 0-2 (1).
+        sub_graph, comp_ids = graph.Contract(
+            (array.array('l', [0, 1, 0]), array.array('l', [1, 2, 2]),
+             array.array('l', [3, 1, 1]), 3), 2, random.Random(1))
+        self.assertEqual(2, sub_graph[3])
+        self.assertEqual(1, len(sub_graph[0]))
+        self.assertIn(sub_graph[2][0], (2, 4))
+        self.assertEqual(3, len(comp_ids))
+
+    def testMinCut(self):
+        graph = KargerStein()
+        graph.AddEdge('0', ['1'])
+        graph.AddEdge('1', ['0', '2', '3'])
+        graph.AddEdge('2', ['1', '4'])
+        graph.AddEdge('3', ['1', '4', '5'])
+        graph.AddEdge('4', ['2', '3', '5'])
+        graph.AddEdge('5', ['3', '4'])
+        self.assertEqual(set(['0-1']), graph.KargerSteinMinCut())
+
+    def testRandomGraphs(self):
+        rng = random.Random(1)
+        for _ in xrange(5):
+            edges = set()
+            for node in xrange(1, 12):
+                edges.add((rng.randint(0, node - 1), node))
+            for _ in xrange(25):
+                node1, node2 = rng.sample(xrange(12), 2)
+                edges.add((min(node1, node2), max(node1, node2)))
+            graph = KargerStein()
+            for node1, node2 in edges:
+                graph.AddEdge(str(node1), [str(node2)])
+            cut = graph.KargerSteinMinCut(0.001, rng=rng)
+            self.assertEqual(self.GetBruteForceMinCut(edges), len(cut))
+
+    def testHomework(self):
+        graph = KargerStein()
+        with open('kargerMinCut.txt', 'r') as fd:
+            for line in fd:
+                node_list = line.split()
+                graph.AddEdge(node_list[0], node_list[1:])
+        min_cut = graph.KargerSteinMinCut(0.1, rng=random.Random(1))
+        self.assertEqual(17, len(min_cut))
+
+
+class TestStoerWagner(unittest2.TestCase):
+
+    def testTooFewNodes(self):
+        graph = StoerWagner()
+        graph.AddEdge('0', [])
+        self.assertRaises(Error, graph.MinCut)
+
+    def testInvalidWeight(self):
+        self.assertRaises(Error, StoerWagner().AddWeightedEdge, '0', '1', -1)
+
+    def testMinCut(self):
+        graph = StoerWagner()
+        graph.AddEdge('0', ['1'])
+        graph.AddEdge('1', ['0', '2', '3'])
+        graph.AddEdge('2', ['1', '4'])
+        graph.AddEdge('3', ['1', '4', '5'])
+        graph.AddEdge('4', ['2', '3', '5'])
+        graph.AddEdge('5', ['3', '4'])
+        weight, partition = graph.MinCut()
+        self.assertEqual(1, weight)
+        self.assertIn(set(['0']), partition)
+
+    def testDisconnected(self):
+        graph = StoerWagner()
+        graph.AddEdge('0', ['1'])
+        graph.AddEdge('2', ['3'])
+        weight, partition = graph.MinCut()
+        self.assertEqual(0, weight)
+        self.assertIn(partition[0], (set(['0', '1']), set(['2', '3'])))
+
+    def testWeighted(self):
+        # The example graph of the Stoer-Wagner paper, min cut 4.
+        graph = StoerWagner()
+        for node1, node2, weight in [
+            ('1', '2', 2), ('1', '5', 3), ('2', '3', 3), ('2', '5', 2),
+            ('2', '6', 2), ('3', '4', 4), ('3', '7', 2), ('4', '7', 2),
+            ('4', '8', 2), ('5', '6', 3), ('6', '7', 1), ('7', '8', 3)]:
+            graph.AddWeightedEdge(node1, node2, weight)
+        weight, partition = graph.MinCut()
+        self.assertEqual(4, weight)
+        self.assertIn(set(['3', '4', '7', '8']), partition)
+
+    def testMultiEdges(self):
+        graph = StoerWagner()
+        graph.AddEdge('0', ['1', '2'])
+        graph.AddEdge('1', ['2'])
+        graph.AddWeightedEdge('0', '1', 2)
+        graph.AddWeightedEdge('1', '0', 2)
+        weight, partition = graph.MinCut()
+        self.assertEqual(2, weight)
+        self.assertIn(set(['2']), partition)
+
+    def testRandomGraphs(self):
+        rng = random.Random(3)
+        for _ in xrange(5):
+            graph, array_graph = StoerWagner(), ArrayMinCut()
+            edges = [(node, rng.randint(0, node - 1)) for node in xrange(1, 30)]
+            edges.extend(rng.sample(xrange(30), 2) for _ in xrange(60))
+            for node1, node2 in edges:
+                graph.AddEdge(str(node1), [str(node2)])
+                array_graph.AddEdge(str(node1), [str(node2)])
+            weight, (side, _) = graph.MinCut()
+            self.assertEqual(
+                len(array_graph.ParallelMinCut(trials=2000, processes=1,
+                                               lower_bound=weight)), weight)
+            self.assertEqual(weight, sum(
+                1 for edge in graph.all_edges
+                if len(set(edge.split('-')) & side) == 1))
+
+    def testHomework(self):
+        graph = StoerWagner()
+        with open('kargerMinCut.txt', 'r') as fd:
+            for line in fd:
+                node_list = line.split()
+                graph.AddEdge(node_list[0], node_list[1:])
+        self.assertEqual(17, graph.MinCut()[0])
+
+
 class TestMinCut(unittest2.TestCase):
 
     def testRandomCut(self):
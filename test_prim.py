@@ -1,9 +1,19 @@
 #!/usr/bin/python
 
 
+import array
 import heapq
+import random
+import sys
+import test_cluster
+import test_dijkstra
 import unittest2
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class Error(Exception):
     """Base error class."""
@@ -92,6 +102,184 @@ class Prim(object):
             self.mst['skip heappush'] += 1
 
 
+class ArrayMst(object):
+    """Base class of MST engines on integer node ids and flat edge arrays.
+
+    Node labels are mapped to ids 0..n-1 in order of first use and edge i
+    is (sources[i], dests[i], costs[i]).  GetMstCost returns the total cost
+    and the MST edges as arrays of node ids; node_list maps ids back.
+    """
+
+    def __init__(self):
+        self.node_ids = {}
+        self.node_list = []
+        self.sources = array.array('l')
+        self.dests = array.array('l')
+        self.costs = array.array('l')
+
+    def Add(self, node1, node2, cost):
+        if not node1 or not node2:
+            raise Error(
+                'Invalid node1/node2: {}/{}'.format(node1, node2))
+        self.sources.append(self.GetNodeId(node1))
+        self.dests.append(self.GetNodeId(node2))
+        self.costs.append(int(cost))
+
+    def GetMstCost(self):
+        raise NotImplementedError
+
+    def GetNodeId(self, node):
+        if node not in self.node_ids:
+            self.node_ids[node] = len(self.node_list)
+            self.node_list.append(node)
+        return self.node_ids[node]
+
+    def NewResult(self):
+        return {'total costs': 0, 'sources': array.array('l'),
+                'dests': array.array('l'), 'costs': array.array('l')}
+
+    def SaveEdge(self, result, node1, node2, cost):
+        result['sources'].append(node1)
+        result['dests'].append(node2)
+        result['costs'].append(cost)
+        result['total costs'] += cost
+
+    @property
+    def num_nodes(self):
+        return len(self.node_list)
+
+
+class HeapPrim(ArrayMst):
+    """O(m log n) Prim on a CSR graph with an indexed decrease-key heap.
+
+    Only the neighbors of the node just added to the tree are updated.
+    """
+
+    def GetMstCost(self):
+        num_nodes = self.num_nodes
+        result = self.NewResult()
+        result['decrease keys'] = 0
+        if not num_nodes:
+            return result
+        graph = test_dijkstra.CsrGraph.FromArrays(
+            self.sources + self.dests, self.dests + self.sources,
+            self.costs + self.costs, num_nodes=num_nodes)
+        in_tree = bytearray(num_nodes)
+        min_cost = array.array('l', [sys.maxint]) * num_nodes
+        pred = array.array('l', [-1]) * num_nodes
+        heap = test_dijkstra.IndexedHeap(array.array('l', [-1]) * num_nodes)
+        heap.Push(0, 0)
+        tree_size = 0
+        while heap:
+            cost, node = heap.Pop()
+            in_tree[node] = 1
+            tree_size += 1
+            if pred[node] != -1:
+                self.SaveEdge(result, pred[node], node, cost)
+            for neighbor, cost in graph.Adjacencies(node):
+                if in_tree[neighbor] or cost >= min_cost[neighbor]:
+                    continue
+                min_cost[neighbor] = cost
+                pred[neighbor] = node
+                if neighbor in heap:
+                    heap.DecreaseKey(cost, neighbor)
+                    result['decrease keys'] += 1
+                else:
+                    heap.Push(cost, neighbor)
+        if tree_size != num_nodes:
+            raise Error('Graph is not connected.')
+        return result
+
+
+class Kruskal(ArrayMst):
+    """Kruskal: sort the edges once, then join them with ArrayUnionFind."""
+
+    def GetMstCost(self):
+        num_nodes = self.num_nodes
+        result = self.NewResult()
+        if numpy is not None:
+            order = numpy.argsort(
+                numpy.frombuffer(self.costs, dtype=numpy.int_),
+                kind='mergesort')
+        else:
+            order = sorted(xrange(len(self.costs)),
+                           key=self.costs.__getitem__)
+        uf = test_cluster.ArrayUnionFind(num_nodes)
+        uf.Add(xrange(num_nodes))
+        for edge in order:
+            if len(result['sources']) == num_nodes - 1:
+                break
+            node1, node2 = self.sources[edge], self.dests[edge]
+            if uf.Union(node1, node2):
+                self.SaveEdge(result, node1, node2, self.costs[edge])
+        if num_nodes and len(result['sources']) != num_nodes - 1:
+            raise Error('Graph is not connected.')
+        return result
+
+
+class Boruvka(ArrayMst):
+    """Boruvka: every round joins each component to its cheapest edge.
+
+    The per-component minimum is a NumPy scatter-min over the edges that
+    still cross components.  Edges are ranked by (cost, index) so equal
+    costs never close a cycle.
+    """
+
+    def __init__(self):
+        super(Boruvka, self).__init__()
+        if numpy is None:
+            raise Error('NumPy is required for Boruvka.')
+
+    def GetMinRanks(self, ranks, comp1, comp2, num_nodes):
+        """Return the lowest edge rank leaving each component."""
+        min_ranks = numpy.empty(num_nodes, dtype=numpy.int_)
+        min_ranks.fill(len(self.costs))
+        numpy.minimum.at(min_ranks, comp1, ranks)
+        numpy.minimum.at(min_ranks, comp2, ranks)
+        return min_ranks
+
+    def GetMstCost(self):
+        num_nodes = self.num_nodes
+        result = self.NewResult()
+        result['rounds'] = 0
+        sources = numpy.frombuffer(self.sources, dtype=numpy.int_)
+        dests = numpy.frombuffer(self.dests, dtype=numpy.int_)
+        costs = numpy.frombuffer(self.costs, dtype=numpy.int_)
+        order = numpy.argsort(costs, kind='mergesort')
+        rank = numpy.empty_like(order)
+        rank[order] = numpy.arange(len(order))
+        uf = test_cluster.ArrayUnionFind(num_nodes)
+        uf.Add(xrange(num_nodes))
+        edges = numpy.arange(len(order))
+        while True:
+            # Point every node at its root by pointer jumping.
+            comp = numpy.frombuffer(
+                uf.parent, dtype=numpy.int32).astype(numpy.int_)
+            while True:
+                next_comp = comp[comp]
+                if numpy.array_equal(next_comp, comp):
+                    break
+                comp = next_comp
+            comp1, comp2 = comp[sources[edges]], comp[dests[edges]]
+            # Edges inside a component stay inside it for good.
+            cross = comp1 != comp2
+            edges, comp1, comp2 = edges[cross], comp1[cross], comp2[cross]
+            if not len(edges):
+                break
+            result['rounds'] += 1
+            min_ranks = self.GetMinRanks(rank[edges], comp1, comp2,
+                                         num_nodes)
+            for edge in order[numpy.unique(
+                min_ranks[min_ranks < len(order)])]:
+                node1, node2 = int(sources[edge]), int(dests[edge])
+                # Two components may have picked the same edge.
+                if uf.Union(node1, node2):
+                    self.SaveEdge(result, node1, node2, int(costs[edge]))
+        if num_nodes and len(result['sources']) != num_nodes - 1:
+            raise Error('Graph is not connected.')
+        return result
+
+
 class PrimTest(unittest2.TestCase):
 
     def testInvalidAdd(self):
@@ -149,6 +337,186 @@ class PrimTest(unittest2.TestCase):
         self.assertEqual(prim.GetMstCost()['total costs'], 48)
 
 
+class HeapPrimTest(unittest2.TestCase):
+
+    def testInvalidAdd(self):
+        with self.assertRaises(Error):
+            HeapPrim().Add(None, None, 1)
+
+    def testEmpty(self):
+        self.assertEqual(0, HeapPrim().GetMstCost()['total costs'])
+
+    def testNotConnected(self):
+        prim = HeapPrim()
+        prim.Add('1', '2', 1)
+        prim.Add('3', '4', 1)
+        self.assertRaises(Error, prim.GetMstCost)
+
+    def testSample1(self):
+        prim = HeapPrim()
+        edges = [('1', '2', '1'),
+                 ('1', '4', 3),
+                 ('1', '3', '4'),
+                 ('2', '4', '2'),
+                 ('3', '4', 5)]
+        for edge in edges:
+            prim.Add(*edge)
+        result = prim.GetMstCost()
+        self.assertEqual(result['total costs'], 7)
+        self.assertEqual([1, 2, 4], sorted(result['costs']))
+        self.assertEqual(
+            set(['1-2', '2-4', '1-3']),
+            set('-'.join(sorted([prim.node_list[node1],
+                                 prim.node_list[node2]]))
+                for node1, node2 in zip(result['sources'], result['dests'])))
+
+    def testSample2(self):
+        prim = HeapPrim()
+        edges = [('1', '2', '2'),
+                 ('1', '4', 4),
+                 ('2', '3', '4'),
+                 ('2', '4', 4),
+                 ('2', '5', '3'),
+                 ('2', '6', '1'),
+                 ('3', '6', 5),
+                 ('4', '5', '2'),
+                 ('5', '6', 5)]
+        for edge in edges:
+            prim.Add(*edge)
+        self.assertEqual(prim.GetMstCost()['total costs'], 12)
+
+    def testSample3(self):
+        prim = HeapPrim()
+        edges = [('1', '2', '3'),
+                 ('1', '6', '2'),
+                 ('2', '3', 17),
+                 ('2', '4', 16),
+                 ('3', '4', '8'),
+                 ('3', '9', 18),
+                 ('4', '5', 11),
+                 ('4', '9', '4'),
+                 ('5', '6', '1'),
+                 ('5', '7', '6'),
+                 ('5', '8', '5'),
+                 ('5', '9', '10'),
+                 ('6', '7', 7),
+                 ('7', '8', 15),
+                 ('8', '9', 12),
+                 ('8', '10', 13),
+                 ('9', '10', '9')]
+        for edge in edges:
+            prim.Add(*edge)
+        result = prim.GetMstCost()
+        self.assertEqual(result['total costs'], 48)
+        self.assertEqual(9, len(result['sources']))
+
+
+class KruskalTest(unittest2.TestCase):
+
+    def testInvalidAdd(self):
+        with self.assertRaises(Error):
+            Kruskal().Add(None, None, 1)
+
+    def testNotConnected(self):
+        kruskal = Kruskal()
+        kruskal.Add('1', '2', 1)
+        kruskal.Add('3', '4', 1)
+        self.assertRaises(Error, kruskal.GetMstCost)
+
+    def testSample2(self):
+        kruskal = Kruskal()
+        edges = [('1', '2', '2'),
+                 ('1', '4', 4),
+                 ('2', '3', '4'),
+                 ('2', '4', 4),
+                 ('2', '5', '3'),
+                 ('2', '6', '1'),
+                 ('3', '6', 5),
+                 ('4', '5', '2'),
+                 ('5', '6', 5)]
+        for edge in edges:
+            kruskal.Add(*edge)
+        result = kruskal.GetMstCost()
+        self.assertEqual(result['total costs'], 12)
+        self.assertEqual([1, 2, 2, 3, 4], sorted(result['costs']))
+
+    def testRandom(self):
+        random.seed(1)
+        for _ in xrange(10):
+            kruskal, prim = Kruskal(), HeapPrim()
+            for node in xrange(2, 51):
+                # Connect node to a random earlier node plus extra edges.
+                for mst in (kruskal, prim):
+                    mst.Add(node, random.randint(1, node - 1), 0)
+            for _ in xrange(200):
+                edge = (random.randint(1, 50), random.randint(1, 50),
+                        random.randint(-10, 10))
+                kruskal.Add(*edge)
+                prim.Add(*edge)
+            self.assertEqual(prim.GetMstCost()['total costs'],
+                             kruskal.GetMstCost()['total costs'])
+
+
+@unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+class BoruvkaTest(unittest2.TestCase):
+
+    def testNotConnected(self):
+        boruvka = Boruvka()
+        boruvka.Add('1', '2', 1)
+        boruvka.Add('3', '4', 1)
+        self.assertRaises(Error, boruvka.GetMstCost)
+
+    def testSample3(self):
+        boruvka = Boruvka()
+        edges = [('1', '2', '3'),
+                 ('1', '6', '2'),
+                 ('2', '3', 17),
+                 ('2', '4', 16),
+                 ('3', '4', '8'),
+                 ('3', '9', 18),
+                 ('4', '5', 11),
+                 ('4', '9', '4'),
+                 ('5', '6', '1'),
+                 ('5', '7', '6'),
+                 ('5', '8', '5'),
+                 ('5', '9', '10'),
+                 ('6', '7', 7),
+                 ('7', '8', 15),
+                 ('8', '9', 12),
+                 ('8', '10', 13),
+                 ('9', '10', '9')]
+        for edge in edges:
+            boruvka.Add(*edge)
+        result = boruvka.GetMstCost()
+        self.assertEqual(result['total costs'], 48)
+        self.assertEqual(9, len(result['sources']))
+        self.assertLessEqual(result['rounds'], 4)
+
+    def testEqualCosts(self):
+        # A cycle of equal costs must not be closed by the tie-break.
+        boruvka = Boruvka()
+        for node in xrange(1, 7):
+            boruvka.Add(node, node % 6 + 1, 1)
+        result = boruvka.GetMstCost()
+        self.assertEqual(5, result['total costs'])
+        self.assertEqual(5, len(result['sources']))
+
+    def testRandom(self):
+        random.seed(2)
+        for _ in xrange(20):
+            boruvka, prim = Boruvka(), HeapPrim()
+            for node in xrange(2, 51):
+                for mst in (boruvka, prim):
+                    mst.Add(node, random.randint(1, node - 1), 0)
+            for _ in xrange(200):
+                edge = (random.randint(1, 50), random.randint(1, 50),
+                        random.randint(-10, 10))
+                boruvka.Add(*edge)
+                prim.Add(*edge)
+            self.assertEqual(prim.GetMstCost()['total costs'],
+                             boruvka.GetMstCost()['total costs'])
+
+
 class HWTest(unittest2.TestCase):
 
     def test(self):
@@ -160,6 +528,36 @@ class HWTest(unittest2.TestCase):
                 prim.Add(*fd.next().split())
         self.assertEqual(-3612829, prim.GetMstCost()['total costs'])
 
+    def testHeapPrim(self):
+        prim = HeapPrim()
+        with open('edges.txt', 'r') as fd:
+            n_nodes, n_edges = [
+                int(num) for num in fd.next().split()]
+            for _ in xrange(n_edges):
+                prim.Add(*fd.next().split())
+        result = prim.GetMstCost()
+        self.assertEqual(-3612829, result['total costs'])
+        self.assertEqual(n_nodes - 1, len(result['sources']))
+
+    def testKruskal(self):
+        kruskal = Kruskal()
+        with open('edges.txt', 'r') as fd:
+            n_nodes, n_edges = [
+                int(num) for num in fd.next().split()]
+            for _ in xrange(n_edges):
+                kruskal.Add(*fd.next().split())
+        self.assertEqual(-3612829, kruskal.GetMstCost()['total costs'])
+
+    @unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+    def testBoruvka(self):
+        boruvka = Boruvka()
+        with open('edges.txt', 'r') as fd:
+            n_nodes, n_edges = [
+                int(num) for num in fd.next().split()]
+            for _ in xrange(n_edges):
+                boruvka.Add(*fd.next().split())
+        self.assertEqual(-3612829, boruvka.GetMstCost()['total costs'])
+
 
 if __name__ == '__main__':
     unittest2.main()
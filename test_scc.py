@@ -1,10 +1,20 @@
 #!/opt/local/bin/pypy
 
 
+import array
 import collections
+import os
+import random
 import sys
+import tempfile
+import test_dijkstra
 import unittest2
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 sys.setrecursionlimit(300000)
 
@@ -12,6 +22,9 @@ sys.setrecursionlimit(300000)
 STACK_DFS = 1
 STACK_POST_DFS = 2
 
+# Bytes of edge-list text parsed per numpy call.
+CHUNK_SIZE = 1 << 24
+
 
 class Error(Exception):
     """Base error class."""
@@ -127,6 +140,238 @@ class SccGraphStack(SccGraph):
                 label_func(this_node)
                 
 
+class EdgeFileLoader(object):
+    """Load a "source dest" edge-list file into forward/reverse CsrGraphs.
+
+    The text is parsed in CHUNK_SIZE pieces with numpy, so no per-edge Python
+    object is ever built.  With cache_file the parsed (2, m) edge array is
+    saved as .npy and memory-mapped on later runs instead of re-parsing.
+    Graph node i is file id i + node_base, so the graphs have
+    max id - node_base + 1 nodes.  Pass node_base=1 for 1-based files such
+    as SCC.txt, otherwise node 0 is an isolated phantom node.  The cache
+    keeps the ids of the file.
+    """
+
+    def __init__(self, file_name, cache_file=None, chunk_size=CHUNK_SIZE,
+                 node_base=0):
+        if numpy is None:
+            raise Error('NumPy is required for EdgeFileLoader.')
+        self.file_name = file_name
+        self.cache_file = cache_file
+        self.chunk_size = chunk_size
+        self.node_base = node_base
+        self.edges = None
+
+    def GetCsrGraph(self, reverse=False):
+        """Build the CSR graph.
+
+        Row offsets come from a bincount of the source column and a stable
+        argsort on it places the edges, keeping their file order per row.
+        """
+        edges = self.ReadEdges()
+        if self.node_base:
+            edges = edges - self.node_base
+        sources, dests = (edges[1], edges[0]) if reverse else edges
+        num_nodes = self.num_nodes
+        offsets = numpy.zeros(num_nodes + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(sources, minlength=num_nodes),
+                     out=offsets[1:])
+        neighbors = dests[numpy.argsort(sources, kind='mergesort')]
+        return test_dijkstra.CsrGraph(
+            num_nodes, offsets, neighbors,
+            numpy.zeros(len(neighbors), dtype=numpy.int8))
+
+    def ParseFile(self):
+        chunks = []
+        rest = ''
+        with open(self.file_name, 'rb') as fd:
+            while True:
+                data = fd.read(self.chunk_size)
+                if not data:
+                    break
+                data = rest + data
+                end = data.rfind('\n') + 1
+                rest = data[end:]
+                if end:
+                    chunks.append(numpy.fromstring(
+                        data[:end], dtype=numpy.int64, sep=' '))
+        if rest.strip():
+            chunks.append(numpy.fromstring(rest, dtype=numpy.int64, sep=' '))
+        values = (numpy.concatenate(chunks) if chunks
+                  else numpy.zeros(0, dtype=numpy.int64))
+        if len(values) % 2:
+            raise Error('Odd number of node ids in {}'.format(self.file_name))
+        return values.reshape(-1, 2).T.copy()
+
+    def ReadEdges(self):
+        if self.edges is not None:
+            return self.edges
+        if self.cache_file and os.path.exists(self.cache_file):
+            self.edges = numpy.load(self.cache_file, mmap_mode='r')
+        else:
+            self.edges = self.ParseFile()
+            if self.cache_file:
+                numpy.save(self.cache_file, self.edges)
+        return self.edges
+
+    @property
+    def num_nodes(self):
+        edges = self.ReadEdges()
+        if not edges.size:
+            return 0
+        if int(edges.min()) < self.node_base:
+            raise Error('Node id {} is below node_base {}'.format(
+                int(edges.min()), self.node_base))
+        return int(edges.max()) - self.node_base + 1
+
+
+class TarjanScc(object):
+    """Single-pass iterative Tarjan SCC on a CsrGraph of integer node ids.
+
+    Needs no reverse graph and no recursion.  Per-node state lives in flat
+    index/lowlink arrays and the DFS stack holds (node, next edge slot).
+    """
+
+    def __init__(self, graph=None):
+        self.graph = graph
+        self.node_ids = {}
+        self.node_list = []
+        self.sources = array.array('l')
+        self.dests = array.array('l')
+
+    def AddEdge(self, source, dest):
+        if self.graph is not None:
+            raise Error('CsrGraph is read-only.')
+        self.sources.append(self.GetNodeId(source))
+        self.dests.append(self.GetNodeId(dest))
+
+    def GetComponents(self):
+        """Return (number of SCCs, component id per node).
+
+        Component ids are assigned in the order Tarjan completes them, which
+        is a reverse topological order of the condensation.
+        """
+        num_comps, comp, _ = self.Search()
+        return num_comps, comp
+
+    def GetCondensation(self):
+        """Return (component id per node, condensation DAG, topological order).
+
+        The DAG is a CsrGraph on component ids without duplicate edges or
+        self-loops, built in the same Tarjan pass.
+        """
+        num_comps, comp, dag = self.Search(condense=True)
+        return comp, dag, array.array('l', xrange(num_comps - 1, -1, -1))
+
+    def GetCsrGraph(self):
+        if self.graph is None:
+            self.graph = test_dijkstra.CsrGraph.FromArrays(
+                self.sources, self.dests,
+                array.array('b', [0]) * len(self.sources),
+                num_nodes=len(self.node_list), typecode='b')
+            self.sources, self.dests = array.array('l'), array.array('l')
+        return self.graph
+
+    def GetNodeId(self, node):
+        if node not in self.node_ids:
+            self.node_ids[node] = len(self.node_list)
+            self.node_list.append(node)
+        return self.node_ids[node]
+
+    def GetSccList(self):
+        num_comps, comp = self.GetComponents()
+        scc_list = [set() for _ in xrange(num_comps)]
+        for node, comp_id in enumerate(comp):
+            scc_list[comp_id].add(
+                self.node_list[node] if self.node_list else node)
+        return scc_list
+
+    def Search(self, condense=False):
+        """Run Tarjan and return (number of SCCs, comp, DAG or None)."""
+        graph = self.GetCsrGraph()
+        offsets, neighbors = graph.offsets, graph.neighbors
+        num_nodes = len(graph)
+        index = array.array('l', [-1]) * num_nodes
+        lowlink = array.array('l', [0]) * num_nodes
+        comp = array.array('l', [-1]) * num_nodes
+        on_stack = bytearray(num_nodes)
+        scc_stack = []
+        counter = num_comps = 0
+        if condense:
+            # marker[c] is the last component that recorded an edge to c.
+            marker = array.array('l', [-1]) * num_nodes
+            dag_offsets = array.array('l', [0])
+            dag_neighbors = array.array('l')
+        for root in xrange(num_nodes):
+            if index[root] != -1:
+                continue
+            index[root] = lowlink[root] = counter
+            counter += 1
+            scc_stack.append(root)
+            on_stack[root] = 1
+            dfs_nodes, dfs_slots = [root], [offsets[root]]
+            while dfs_nodes:
+                node = dfs_nodes[-1]
+                slot, end = dfs_slots[-1], offsets[node+1]
+                while slot < end:
+                    neighbor = neighbors[slot]
+                    slot += 1
+                    if index[neighbor] == -1:
+                        break
+                    if on_stack[neighbor] and index[neighbor] < lowlink[node]:
+                        lowlink[node] = index[neighbor]
+                else:
+                    neighbor = -1
+                if neighbor != -1:
+                    # Descend into neighbor; resume node at slot later.
+                    dfs_slots[-1] = slot
+                    index[neighbor] = lowlink[neighbor] = counter
+                    counter += 1
+                    scc_stack.append(neighbor)
+                    on_stack[neighbor] = 1
+                    dfs_nodes.append(neighbor)
+                    dfs_slots.append(offsets[neighbor])
+                    continue
+                dfs_nodes.pop()
+                dfs_slots.pop()
+                if lowlink[node] == index[node]:
+                    members = []
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack[member] = 0
+                        comp[member] = num_comps
+                        members.append(member)
+                        if member == node:
+                            break
+                    if condense:
+                        # Every edge out of the new SCC ends in it or in an
+                        # SCC completed before, so its DAG row is final now.
+                        marker[num_comps] = num_comps
+                        for member in members:
+                            for slot in xrange(offsets[member],
+                                               offsets[member+1]):
+                                comp_id = comp[neighbors[slot]]
+                                if marker[comp_id] != num_comps:
+                                    marker[comp_id] = num_comps
+                                    dag_neighbors.append(comp_id)
+                        dag_offsets.append(len(dag_neighbors))
+                    num_comps += 1
+                if dfs_nodes and lowlink[node] < lowlink[dfs_nodes[-1]]:
+                    lowlink[dfs_nodes[-1]] = lowlink[node]
+        if not condense:
+            return num_comps, comp, None
+        dag = test_dijkstra.CsrGraph(
+            num_comps, dag_offsets, dag_neighbors,
+            array.array('b', [0]) * len(dag_neighbors))
+        return num_comps, comp, dag
+
+    @property
+    def length(self):
+        if self.graph is None:
+            return len(self.node_list)
+        return len(self.graph)
+
+
 class TestKosaraju(unittest2.TestCase):
 
     def testDfsInvalidVisited(self):
@@ -235,6 +480,189 @@ class TestKosarajuStack(unittest2.TestCase):
             self.assertIn(scc, expect_scc_list)
 
 
+class TestTarjan(unittest2.TestCase):
+
+    def testAddEdgeReadOnly(self):
+        graph = TarjanScc(test_dijkstra.CsrGraph.FromEdges([(0, 1, 0)]))
+        self.assertRaises(Error, graph.AddEdge, 1, 0)
+
+    def testK1(self):
+        graph = TarjanScc()
+        graph.AddEdge(0, 1)
+        graph.AddEdge(1, 2)
+        expect_scc_list = [set([i]) for i in xrange(3)]
+        for scc in graph.GetSccList():
+            self.assertIn(scc, expect_scc_list)
+
+    def testK2(self):
+        graph = TarjanScc()
+        graph.AddEdge(0, 1)
+        graph.AddEdge(1, 2)
+        graph.AddEdge(2, 1)
+        expect_scc_list = [set([0]), set([1, 2])]
+        for scc in graph.GetSccList():
+            self.assertIn(scc, expect_scc_list)
+
+    def testK3(self):
+        graph = TarjanScc()
+        graph.AddEdge(0, 1)
+        graph.AddEdge(1, 2)
+        graph.AddEdge(0, 3)
+        graph.AddEdge(3, 0)
+        graph.AddEdge(1, 4)
+        graph.AddEdge(4, 1)
+        graph.AddEdge(2, 5)
+        graph.AddEdge(5, 2)
+        expect_scc_list = [set([0, 3]), set([1, 4]), set([2, 5])]
+        for scc in graph.GetSccList():
+            self.assertIn(scc, expect_scc_list)
+
+    def testK4(self):
+        graph = TarjanScc()
+        graph.AddEdge(0, 1)
+        graph.AddEdge(1, 2)
+        graph.AddEdge(1, 3)
+        graph.AddEdge(2, 0)
+        graph.AddEdge(2, 4)
+        graph.AddEdge(2, 5)
+        graph.AddEdge(3, 4)
+        graph.AddEdge(3, 5)
+        graph.AddEdge(4, 5)
+        graph.AddEdge(5, 4)
+        expect_scc_list = [set([0, 1, 2]), set([3]), set([4, 5])]
+        for scc in graph.GetSccList():
+            self.assertIn(scc, expect_scc_list)
+
+    def testLongPath(self):
+        # Deeper than any sane recursion limit would allow.
+        graph = TarjanScc()
+        for node in xrange(500000):
+            graph.AddEdge(node, node + 1)
+        graph.AddEdge(500000, 0)
+        self.assertEqual([set(xrange(500001))], graph.GetSccList())
+
+    def testCondensation(self):
+        graph = TarjanScc()
+        for edge in [(0, 1), (1, 2), (2, 0), (2, 3), (1, 3), (3, 4), (4, 3),
+                     (0, 5), (5, 4), (6, 6)]:
+            graph.AddEdge(*edge)
+        comp, dag, topo_order = graph.GetCondensation()
+        self.assertEqual(4, len(dag))
+        self.assertEqual(len(set(comp)), len(dag))
+        self.assertEqual(comp[0], comp[1])
+        self.assertEqual(comp[3], comp[4])
+        comp_012, comp_34, comp_5 = comp[0], comp[3], comp[5]
+        self.assertEqual(sorted([comp_34, comp_5]),
+                         sorted(n for n, _ in dag.Adjacencies(comp_012)))
+        self.assertEqual([comp_34],
+                         [n for n, _ in dag.Adjacencies(comp_5)])
+        self.assertEqual([], list(dag.Adjacencies(comp[6])))
+        self.assertEqual([], list(dag.Adjacencies(comp_34)))
+        self.assertEqual(sorted(topo_order), range(len(dag)))
+
+    def testRandomCondensation(self):
+        random.seed(2)
+        for _ in xrange(20):
+            graph = TarjanScc()
+            edges = [(random.randint(0, 29), random.randint(0, 29))
+                     for _ in xrange(50)]
+            for edge in edges:
+                graph.AddEdge(*edge)
+            comp, dag, topo_order = graph.GetCondensation()
+            rank = dict((comp_id, i) for i, comp_id in enumerate(topo_order))
+            expect = set()
+            for source, dest in edges:
+                source = comp[graph.node_ids[source]]
+                dest = comp[graph.node_ids[dest]]
+                if source != dest:
+                    expect.add((source, dest))
+                    self.assertLess(rank[source], rank[dest])
+            dag_edges = [(comp_id, n) for comp_id in dag
+                         for n, _ in dag.Adjacencies(comp_id)]
+            self.assertEqual(len(expect), len(dag_edges))
+            self.assertEqual(expect, set(dag_edges))
+
+    def testRandom(self):
+        random.seed(1)
+        for _ in xrange(20):
+            kosaraju, tarjan = SccGraphStack(), TarjanScc()
+            for _ in xrange(60):
+                edge = random.randint(0, 29), random.randint(0, 29)
+                kosaraju.AddEdge(*edge)
+                tarjan.AddEdge(*edge)
+            self.assertEqual(sorted(map(sorted, kosaraju.GetSccList())),
+                             sorted(map(sorted, tarjan.GetSccList())))
+
+
+@unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+class TestEdgeFileLoader(unittest2.TestCase):
+    EDGES = [(1, 2), (2, 3), (3, 1), (3, 4), (4, 5), (5, 4), (1, 5), (2, 1)]
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as edge_file:
+            for edge in self.EDGES:
+                edge_file.write('{} {}\n'.format(*edge))
+        self.cache_file = self.file_name + '.npy'
+
+    def tearDown(self):
+        for file_name in (self.file_name, self.cache_file):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def assertSameGraph(self, expect, graph):
+        self.assertEqual(len(expect), len(graph))
+        for node in expect:
+            self.assertEqual([neighbor for neighbor, _ in
+                              expect.Adjacencies(node)],
+                             [neighbor for neighbor, _ in
+                              graph.Adjacencies(node)])
+
+    def testCsrGraph(self):
+        loader = EdgeFileLoader(self.file_name)
+        self.assertSameGraph(test_dijkstra.CsrGraph.FromEdges(
+            (edge[0], edge[1], 0) for edge in self.EDGES),
+            loader.GetCsrGraph())
+        self.assertSameGraph(test_dijkstra.CsrGraph.FromEdges(
+            (edge[1], edge[0], 0) for edge in self.EDGES),
+            loader.GetCsrGraph(reverse=True))
+
+    def testSmallChunks(self):
+        # Chunks of 3 bytes cut most lines in the middle of a node id.
+        loader = EdgeFileLoader(self.file_name, chunk_size=3)
+        self.assertEqual([list(column) for column in zip(*self.EDGES)],
+                         loader.ReadEdges().tolist())
+
+    def testCache(self):
+        EdgeFileLoader(self.file_name, cache_file=self.cache_file).ReadEdges()
+        os.remove(self.file_name)
+        loader = EdgeFileLoader(self.file_name, cache_file=self.cache_file)
+        self.assertIsInstance(loader.ReadEdges(), numpy.memmap)
+        scc_list = TarjanScc(loader.GetCsrGraph()).GetSccList()
+        self.assertIn(set([1, 2, 3]), scc_list)
+        self.assertIn(set([4, 5]), scc_list)
+
+    def testOddIds(self):
+        with open(self.file_name, 'a') as edge_file:
+            edge_file.write('6\n')
+        self.assertRaises(Error, EdgeFileLoader(self.file_name).ReadEdges)
+
+    def testNodeBase(self):
+        self.assertEqual(6, EdgeFileLoader(self.file_name).num_nodes)
+        loader = EdgeFileLoader(self.file_name, cache_file=self.cache_file,
+                                node_base=1)
+        self.assertEqual(5, loader.num_nodes)
+        self.assertSameGraph(test_dijkstra.CsrGraph.FromEdges(
+            (edge[0] - 1, edge[1] - 1, 0) for edge in self.EDGES),
+            loader.GetCsrGraph())
+        self.assertEqual([list(column) for column in zip(*self.EDGES)],
+                         numpy.load(self.cache_file).tolist())
+        scc_list = TarjanScc(loader.GetCsrGraph()).GetSccList()
+        self.assertEqual(2, len(scc_list))
+        with self.assertRaises(Error):
+            EdgeFileLoader(self.file_name, node_base=2).GetCsrGraph()
+
+
 class HWTest(unittest2.TestCase):
 
     def setUp(self):
@@ -248,7 +676,23 @@ class HWTest(unittest2.TestCase):
         scc_list = graph.GetSccList()
         sort_list = sorted([len(scc) for scc in scc_list], reverse=True)
         self.assertEqual([434821, 968, 459, 313, 211], sort_list[:5])
-        
+
+    @unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+    def testLoader(self):
+        graph = TarjanScc(
+            EdgeFileLoader('SCC.txt', node_base=1).GetCsrGraph())
+        scc_list = graph.GetSccList()
+        sort_list = sorted([len(scc) for scc in scc_list], reverse=True)
+        self.assertEqual([434821, 968, 459, 313, 211], sort_list[:5])
+
+    def testTarjan(self):
+        graph = TarjanScc()
+        for edge in self.edges:
+            graph.AddEdge(*edge)
+        scc_list = graph.GetSccList()
+        sort_list = sorted([len(scc) for scc in scc_list], reverse=True)
+        self.assertEqual([434821, 968, 459, 313, 211], sort_list[:5])
+
 
 if __name__ == '__main__':
     unittest2.main()
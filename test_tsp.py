@@ -3,10 +3,21 @@
 # Traveling saleman problem.
 
 import collections
+import itertools
 import math
+import random
 import sys
 import unittest2
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Error(Exception):
+    """Base error class."""
+
 
 def nCr(n, r):
     if r < 0 or r > n:
@@ -359,6 +370,75 @@ class NewTSP(TSP):
         return int(min(cost_list))
 
 
+class HeldKarpTSP(TSP):
+    """Held-Karp with one dense NumPy layer per subset size.
+
+    The first city is the start.  The other n-1 cities are bits of a subset
+    mask, and layer s is dp[rank of S, j]: the shortest path from the start
+    through the s cities of S ending at city j of S.  rank maps every mask
+    to its row in its own layer, so one 2**(n-1) array serves all layers.
+    A new layer is a min-plus of the previous layer with one distance
+    matrix column per end city, computed in row chunks.
+    """
+
+    def __init__(self, dtype=None, chunk_size=1 << 18):
+        super(HeldKarpTSP, self).__init__()
+        if numpy is None:
+            raise Error('NumPy is required for HeldKarpTSP.')
+        self.dtype = numpy.float32 if dtype is None else dtype
+        self.chunk_size = chunk_size
+
+    def GetDistanceMatrix(self, cities):
+        coordinates = numpy.array([self.city_map[city] for city in cities],
+                                  dtype=numpy.float64)
+        deltas = coordinates[:, numpy.newaxis, :] - coordinates
+        return numpy.sqrt((deltas ** 2).sum(axis=2))
+
+    def GetLayers(self, num_bits):
+        """Return (masks sorted by size, start of each size, rank of mask)."""
+        masks = numpy.arange(1 << num_bits, dtype=numpy.int32)
+        sizes = numpy.zeros(len(masks), dtype=numpy.int8)
+        for bit in xrange(num_bits):
+            sizes += (masks >> bit) & 1
+        order = numpy.argsort(sizes, kind='mergesort').astype(numpy.int32)
+        starts = numpy.zeros(num_bits + 2, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(sizes, minlength=num_bits + 1),
+                     out=starts[1:])
+        rank = numpy.empty(len(masks), dtype=numpy.int32)
+        rank[order] = (numpy.arange(len(masks), dtype=numpy.int64) -
+                       starts[sizes[order]]).astype(numpy.int32)
+        return order, starts, rank
+
+    def GetShortestTour(self):
+        cities = sorted(self.city_map)
+        if len(cities) < 2:
+            return 0
+        distance = self.GetDistanceMatrix(cities)
+        num_bits = len(cities) - 1
+        # Distances between the subset cities 1..n-1 only.
+        inner = distance[1:, 1:].astype(self.dtype)
+        masks, starts, rank = self.GetLayers(num_bits)
+        # Layer 1: the single-city subsets {j} in bit order.
+        dp = numpy.empty((num_bits, num_bits), dtype=self.dtype)
+        dp.fill(numpy.inf)
+        dp[numpy.arange(num_bits), numpy.arange(num_bits)] = distance[0, 1:]
+        for size in xrange(2, num_bits + 1):
+            layer_masks = masks[starts[size]:starts[size+1]]
+            new_dp = numpy.empty((len(layer_masks), num_bits),
+                                 dtype=self.dtype)
+            new_dp.fill(numpy.inf)
+            for end in xrange(num_bits):
+                end_bit = 1 << end
+                rows = numpy.nonzero(layer_masks & end_bit)[0]
+                prev_rows = rank[layer_masks[rows] ^ end_bit]
+                for start in xrange(0, len(rows), self.chunk_size):
+                    chunk = slice(start, start + self.chunk_size)
+                    new_dp[rows[chunk], end] = (
+                        dp[prev_rows[chunk]] + inner[:, end]).min(axis=1)
+            dp = new_dp
+        return int((dp[0].astype(numpy.float64) + distance[1:, 0]).min())
+
+
 class TSPTest(unittest2.TestCase):
     
     def testG1(self):
@@ -399,6 +479,46 @@ class NewTSPTest(unittest2.TestCase):
         self.assertEqual(14, tsp.GetShortestTour())
 
 
+@unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+class HeldKarpTSPTest(unittest2.TestCase):
+
+    def testG1(self):
+        tsp = HeldKarpTSP()
+        city_list = [(0.0, 0.0), (0.0, 1.0),
+                     (2.0, 0.0), (2.0, 1.0)]
+        for idx, (x, y) in enumerate(city_list):
+            tsp.Add(idx+1, x, y)
+        self.assertEqual(6, tsp.GetShortestTour())
+
+    def testG2(self):
+        tsp = HeldKarpTSP()
+        city_list = [(0.0, 0.0), (0.0, 3.0),
+                     (1.0, 0.0), (1.0, 3.0),
+                     (5.0, 0.0)]
+        for idx, (x, y) in enumerate(city_list):
+            tsp.Add(idx+1, x, y)
+        self.assertEqual(14, tsp.GetShortestTour())
+
+    def testFewCities(self):
+        tsp = HeldKarpTSP()
+        self.assertEqual(0, tsp.GetShortestTour())
+        tsp.Add(1, 0.0, 0.0)
+        tsp.Add(2, 3.0, 4.0)
+        self.assertEqual(10, tsp.GetShortestTour())
+
+    def testRandom(self):
+        random.seed(1)
+        for _ in xrange(5):
+            tsp = HeldKarpTSP(dtype=numpy.float64, chunk_size=7)
+            for city in xrange(1, 9):
+                tsp.Add(city, random.uniform(0, 100), random.uniform(0, 100))
+            expect = min(
+                sum(tsp.Distance(city1, city2) for city1, city2 in
+                    zip((1,) + tour, tour + (1,)))
+                for tour in itertools.permutations(xrange(2, 9)))
+            self.assertEqual(int(expect), tsp.GetShortestTour())
+
+
 class TSPHWTest(unittest2.TestCase):
 
     def testHW(self):
@@ -423,5 +543,17 @@ class NewTSPHWTest(unittest2.TestCase):
         self.assertEqual(26442, tsp.GetShortestTour())
 
 
+@unittest2.skipIf(numpy is None, 'NumPy is not installed.')
+class HeldKarpTSPHWTest(unittest2.TestCase):
+
+    def testHW(self):
+        tsp = HeldKarpTSP()
+        with open('tsp.txt', 'r') as fd:
+            total_cities = int(fd.readline())
+            for city in range(1, total_cities+1):
+                x, y = [float(e) for e in fd.readline().split()]
+                tsp.Add(city, x, y)
+        self.assertEqual(26442, tsp.GetShortestTour())
+
 if __name__ == '__main__':
     unittest2.main()